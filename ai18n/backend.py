@@ -0,0 +1,266 @@
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Type,
+    TYPE_CHECKING,
+)
+
+from ai18n.config import conf
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+SYSTEM_MESSAGE = "You are a professional translator proficient in multiple languages."
+
+
+class Completion(NamedTuple):
+    text: str
+    # Response headers, to follow the rate limits advertised by the server
+    headers: Mapping[str, str] = {}
+    # Token usage as reported by the server, if any
+    usage: Any = None
+
+
+class Backend(ABC):
+    """Runs chat completion requests against a model.
+
+    Prompts are built and responses parsed by the OpenAIMessageTranslator, the
+    same way whatever the backend, backends only carry the requests.
+    """
+
+    name = ""
+    # Whether requests can go through offline batch jobs, see `BatchBackend`
+    supports_batch: ClassVar[bool] = False
+
+    @abstractmethod
+    def complete(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Completion:
+        pass
+
+    def stream(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Iterator[Completion]:
+        """Stream the response text in chunks as it gets generated, the headers
+        with every chunk and the usage with the last one if available.
+
+        Backends that can't stream yield the whole response at once.
+        """
+        yield self.complete(prompt, model, max_tokens, temperature)
+
+
+class BatchBackend(Backend):
+    """Backend whose requests can also be written to a file for an offline batch
+    job, and their responses read from the job's output file."""
+
+    supports_batch = True
+
+    @abstractmethod
+    def batch_request(
+        self,
+        custom_id: str,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Dict[str, Any]:
+        """A request in the format of the offline batch input files."""
+
+    @abstractmethod
+    def batch_result_text(self, result: Dict[str, Any]) -> Optional[str]:
+        """Response text from one line of a batch output file, None if it failed."""
+
+
+class OpenAICompatibleBackend(BatchBackend):
+    """The OpenAI API, or any server implementing its chat completions endpoint
+    (vLLM, llama.cpp, Ollama, ...) when given a `base_url`.
+
+    The HTTP client is shared by all the requests, keeping up to `max_connections`
+    connections alive so that concurrent requests don't reconnect each time.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 16,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url or conf.get("base_url") or None
+        self.max_connections = max_connections
+        self.lock = threading.Lock()
+        self._client: Optional["OpenAI"] = None
+
+    @property
+    def client(self) -> "OpenAI":
+        # Instantiated once, on first use so that prompts can be built without an
+        # API key. Retries are left to the scheduler
+        with self.lock:
+            if self._client is None:
+                import httpx
+                from openai import DefaultHttpxClient, OpenAI
+
+                http_client = DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                    )
+                )
+                self._client = OpenAI(
+                    # Self-hosted servers usually don't check the key
+                    api_key=self.api_key or ("unused" if self.base_url else None),
+                    base_url=self.base_url,
+                    max_retries=0,
+                    http_client=http_client,
+                )
+            return self._client
+
+    @client.setter
+    def client(self, client: "OpenAI") -> None:
+        self._client = client
+
+    def complete(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Completion:
+        raw_response = self.client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        response = raw_response.parse()
+        text = (response.choices[0].message.content or "").strip()
+        return Completion(text, raw_response.headers, response.usage)
+
+    def stream(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Iterator[Completion]:
+        raw_response = self.client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in raw_response.parse():
+            # The usage comes in a last chunk, without choices
+            text = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+            yield Completion(text, raw_response.headers, chunk.usage)
+
+    def batch_request(
+        self,
+        custom_id: str,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": SYSTEM_MESSAGE},
+                    {"role": "user", "content": prompt},
+                ],
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+            },
+        }
+
+    def batch_result_text(self, result: Dict[str, Any]) -> Optional[str]:
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            return None
+        choices = (response.get("body") or {}).get("choices") or [{}]
+        return ((choices[0].get("message") or {}).get("content") or "").strip()
+
+
+class EchoBackend(Backend):
+    """Offline backend answering every prompt with pseudo-translations.
+
+    Translations are the msgid prefixed with the language code, eg "[fr] Hello",
+    read from prompts rendered with the bundled templates. Meant for tests, dry
+    runs and benchmarks, optionally after `latency` seconds to mimic a server.
+    """
+
+    name = "echo"
+    LOCALES_REGEX = re.compile(r"following locales: (.*)")
+    MSGID_REGEX = re.compile(r'to translate: """(.*?)"""', re.DOTALL)
+
+    # Size of the chunks responses are streamed in
+    CHUNK_SIZE = 16
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    def answer(self, prompt: str) -> Dict[str, Any]:
+        match = self.LOCALES_REGEX.search(prompt)
+        languages = match.group(1).strip().split(", ") if match else []
+        translations = [
+            {lang: f"[{lang}] {msgid}" for lang in languages}
+            for msgid in self.MSGID_REGEX.findall(prompt)
+        ]
+        # Batch prompts expect the translations keyed on the position of the string
+        if "String number" in prompt:
+            return {str(i): t for i, t in enumerate(translations)}
+        return translations[0] if translations else {}
+
+    def complete(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Completion:
+        if self.latency:
+            time.sleep(self.latency)
+        return Completion(json.dumps(self.answer(prompt), ensure_ascii=False))
+
+    def stream(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Iterator[Completion]:
+        text = self.complete(prompt, model, max_tokens, temperature).text
+        for i in range(0, len(text), self.CHUNK_SIZE):
+            yield Completion(text[i : i + self.CHUNK_SIZE])
+
+
+BACKENDS: Dict[str, Type[Backend]] = {
+    "openai": OpenAICompatibleBackend,
+    "echo": EchoBackend,
+}
+
+
+def get_backend(
+    name: Optional[str] = None,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_connections: int = 16,
+) -> Backend:
+    """Get a backend by name, the configured one by default."""
+    name = name or conf.get("backend") or "openai"
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown translation backend '{name}', "
+            f"expected one of: {', '.join(BACKENDS)}"
+        )
+    if name == "echo":
+        return EchoBackend()
+    return OpenAICompatibleBackend(api_key, base_url, max_connections)
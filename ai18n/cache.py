@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ai18n.config import conf
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai18n")
+
+
+class ResponseCache:
+    """On-disk cache of parsed AI responses, backed by SQLite.
+
+    Entries are content-addressed: the key is a hash of everything that shapes the
+    response (model, temperature, system message and rendered prompt), so re-sending
+    an identical prompt never pays for it twice.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None) -> None:
+        self.cache_dir = cache_dir or conf.get("cache_dir") or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.path = os.path.join(self.cache_dir, "responses.sqlite")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_message: str, prompt: str) -> str:
+        payload = json.dumps([model, temperature, system_message, prompt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self.connection.commit()
+        response: Dict[str, Any] = json.loads(row[0])
+        return response
+
+    def set(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        text = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, text, len(text.encode("utf-8")), now, now),
+            )
+            self.connection.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries, size, oldest, newest = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at), "
+                "MAX(created_at) FROM responses"
+            ).fetchone()
+            models = dict(
+                self.connection.execute(
+                    "SELECT model, COUNT(*) FROM responses GROUP BY model ORDER BY model"
+                ).fetchall()
+            )
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size_bytes": size,
+            "oldest": oldest,
+            "newest": newest,
+            "models": models,
+        }
+
+    def prune(
+        self, max_age_days: Optional[float] = None, max_size_mb: Optional[float] = None
+    ) -> int:
+        """Evict entries older than `max_age_days`, then the least recently used ones
+        until the cache fits in `max_size_mb`. Returns the number of evicted entries."""
+        removed = 0
+        with self.lock:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 86400
+                cursor = self.connection.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (cutoff,)
+                )
+                removed += cursor.rowcount
+            if max_size_mb is not None:
+                max_size = max_size_mb * 1024 * 1024
+                (size,) = self.connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+                rows = self.connection.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at"
+                ).fetchall()
+                for key, entry_size in rows:
+                    if size <= max_size:
+                        break
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    size -= entry_size
+                    removed += 1
+            self.connection.commit()
+            self.connection.execute("VACUUM")
+        return removed
@@ -1,8 +1,19 @@
 import argparse
+import contextlib
+import logging
 import os
+import sys
+import time
 from argparse import ArgumentParser
+from typing import List, Optional
 
+from ai18n.backend import BACKENDS, get_backend
+from ai18n.cache import ResponseCache
 from ai18n.config import conf
+from ai18n.daemon import DAEMON_COMMANDS, forward
+from ai18n.metrics import metrics
+from ai18n.occurrences import changed_files_from_diff, git_changed_files
+from ai18n.planner import MODEL_PRICES, PRIORITIES
 from ai18n.translator import Translator
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -20,8 +31,80 @@ def add_po_files_folder_arg(subparser: ArgumentParser) -> None:
     )
 
 
-def main() -> None:
-    """main function for the CLI."""
+def add_instrumentation_args(subparser: ArgumentParser) -> None:
+    """Add the logging and metrics arguments to the subparser."""
+    subparser.add_argument(
+        "--log-level",
+        type=str.upper,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level, DEBUG also prints the prompts and responses "
+        "(default: INFO)",
+    )
+    subparser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Print a summary of the timings, API latencies and token usage",
+    )
+    subparser.add_argument(
+        "--metrics-json",
+        type=str,
+        help="Write the timings, API latencies and token usage to this JSON file",
+    )
+
+
+def add_changed_files_args(subparser: ArgumentParser) -> None:
+    """Add the arguments restricting a command to strings in changed source files."""
+    subparser.add_argument(
+        "--changed-files",
+        type=str,
+        nargs="+",
+        help="Only consider the strings referenced by these source files",
+    )
+    subparser.add_argument(
+        "--diff-file",
+        type=str,
+        help="Only consider the strings referenced by the files touched by this "
+        "diff (unified diff or one path per line)",
+    )
+    subparser.add_argument(
+        "--since",
+        type=str,
+        help="Only consider the strings referenced by the files changed since this "
+        "git ref in the local checkout",
+    )
+
+
+def get_changed_files(args: argparse.Namespace) -> Optional[List[str]]:
+    """Changed source files from the command line, None if not restricted."""
+    if not (args.changed_files or args.diff_file or args.since):
+        return None
+    changed_files = list(args.changed_files or [])
+    if args.diff_file:
+        with open(args.diff_file, "r", encoding="utf-8") as file:
+            changed_files += changed_files_from_diff(file.read())
+    if args.since:
+        changed_files += git_changed_files(args.since)
+    return changed_files
+
+
+def run_cache_command(args: argparse.Namespace) -> None:
+    cache = ResponseCache()
+    if args.action == "prune":
+        removed = cache.prune(args.max_age_days, args.max_size_mb)
+        print(f"Evicted {removed} cached responses")
+    stats = cache.stats()
+    print(f"Cache location: {stats['path']}")
+    print(f"Entries: {stats['entries']}")
+    print(f"Size: {stats['size_bytes'] / 1024 / 1024:.2f} MB")
+    if stats["entries"]:
+        age_days = (time.time() - stats["oldest"]) / 86400
+        print(f"Oldest entry: {age_days:.1f} days old")
+    for model, count in stats["models"].items():
+        print(f"  {model}: {count} entries")
+
+
+def build_parser() -> ArgumentParser:
     parser = argparse.ArgumentParser(description="Superset Translation Tool")
 
     # Define subcommands
@@ -47,18 +130,137 @@ def main() -> None:
     translate_parser.add_argument(
         "--model", type=str, default="gpt-4-turbo", help="OpenAI model to use"
     )
+    translate_parser.add_argument(
+        "--backend",
+        choices=list(BACKENDS),
+        default=conf.get("backend") or "openai",
+        help="Translation backend, echo answers with pseudo-translations offline "
+        "(default: openai)",
+    )
+    translate_parser.add_argument(
+        "--base-url",
+        type=str,
+        default=conf.get("base_url") or None,
+        help="Base URL of an OpenAI-compatible server to use instead of OpenAI's",
+    )
+    translate_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of translation requests in flight (default: 1)",
+    )
+    translate_parser.add_argument(
+        "--translation-memory",
+        action="store_true",
+        help="Reuse existing translations of near-identical strings before calling "
+        "the API, and pass similar translated strings as references",
+    )
+    translate_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't reuse or store AI responses in the local response cache",
+    )
+    translate_parser.add_argument(
+        "--export-batch",
+        type=str,
+        help="Write the translation requests to this JSONL file for an offline "
+        "batch job, instead of calling the API",
+    )
+    translate_parser.add_argument(
+        "--import-batch",
+        type=str,
+        help="Import the translations from this offline batch job results file",
+    )
+    translate_parser.add_argument(
+        "--requests-per-minute", type=int, help="Budget of API requests per minute"
+    )
+    translate_parser.add_argument(
+        "--tokens-per-minute", type=int, help="Budget of API tokens per minute"
+    )
+    translate_parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=6,
+        help="Retries for rate limited, timed out or failed API requests",
+    )
+    translate_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Maximum number of messages to translate with a single prompt",
+    )
+    translate_parser.add_argument(
+        "--compact-every",
+        type=int,
+        help="Compact the checkpoint journal into the YAML file every N messages "
+        "(default: only once the run completes)",
+    )
+    translate_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream responses, keeping each translation as soon as it arrives and "
+        "what truncated responses contained",
+    )
+    translate_parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Estimate the tokens, cost and time the translation would take, "
+        "without calling the API",
+    )
+    translate_parser.add_argument(
+        "--priority",
+        choices=list(PRIORITIES),
+        help="Translate the strings with the most occurrences, the most words or "
+        "used in the frontend first",
+    )
+    translate_parser.add_argument(
+        "--budget",
+        type=float,
+        help="Only translate as many strings as this estimated cost in USD covers, "
+        "the highest priority ones first",
+    )
+    add_changed_files_args(translate_parser)
     add_po_files_folder_arg(translate_parser)
 
     # Report subcommand
     report_parser = subparsers.add_parser(
         "report", help="Generate a report of translation statistics"
     )
+    report_parser.add_argument(
+        "--format",
+        choices=["table", "json", "csv"],
+        default="table",
+        help="Output format, json and csv go to stdout alone (default: table)",
+    )
+    report_parser.add_argument(
+        "--by-prefix",
+        action="store_true",
+        help="Break the statistics down by occurrence path prefix, eg frontend "
+        "vs backend strings",
+    )
+    report_parser.add_argument(
+        "--prefix-depth",
+        type=int,
+        default=1,
+        help="Number of folders making up an occurrence prefix (default: 1)",
+    )
     add_po_files_folder_arg(report_parser)
 
     # po pull subcommand
     pull_parser = subparsers.add_parser(
         "po-pull", help="Pull translations from .po files into the YAML file"
     )
+    pull_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only merge the .po files that changed since the last pull",
+    )
+    pull_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse .po files (default: 1)",
+    )
     add_po_files_folder_arg(pull_parser)
 
     # flush-ai subcommand
@@ -79,8 +281,78 @@ def main() -> None:
         type=str,
         help="Filter messages by occurrence regex, for instance you can export only strings that live in your frontend",
     )
+    push_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse .po files (default: 1)",
+    )
+    push_parser.add_argument(
+        "--compile-mo",
+        action="store_true",
+        help="Also write the .mo file of each language that changed",
+    )
+    push_parser.add_argument(
+        "--compile-json",
+        action="store_true",
+        help="Also write the Superset JSON catalog (messages.json) of each language "
+        "that changed",
+    )
+    add_changed_files_args(push_parser)
     add_po_files_folder_arg(push_parser)
 
+    # export-yaml / import-yaml subcommands
+    export_parser = subparsers.add_parser(
+        "export-yaml", help="Export the translations catalog to a YAML file"
+    )
+    export_parser.add_argument("yaml_file", type=str, help="YAML file to write")
+    import_parser = subparsers.add_parser(
+        "import-yaml", help="Import a YAML file into the translations catalog"
+    )
+    import_parser.add_argument("yaml_file", type=str, help="YAML file to read")
+
+    # cache subcommand
+    cache_parser = subparsers.add_parser(
+        "cache", help="Inspect or prune the local AI response cache"
+    )
+    cache_parser.add_argument("action", choices=["stats", "prune"])
+    cache_parser.add_argument(
+        "--max-age-days", type=float, help="Evict entries older than this many days"
+    )
+    cache_parser.add_argument(
+        "--max-size-mb",
+        type=float,
+        help="Evict least recently used entries until the cache fits in this size",
+    )
+
+    # serve subcommand
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Keep the catalog in memory and serve the other commands from it, "
+        "watching the .po files",
+    )
+    serve_parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between checks for changed .po files and catalog (default: 1)",
+    )
+    add_po_files_folder_arg(serve_parser)
+
+    for subparser in subparsers.choices.values():
+        add_instrumentation_args(subparser)
+    for command in DAEMON_COMMANDS:
+        subparsers.choices[command].add_argument(
+            "--no-daemon",
+            action="store_true",
+            help="Run the command here even if a daemon is serving the catalog",
+        )
+    return parser
+
+
+def main() -> None:
+    """main function for the CLI."""
+    parser = build_parser()
     args = parser.parse_args()
 
     # If no command is provided, print help
@@ -88,37 +360,179 @@ def main() -> None:
         parser.print_help()
         return
 
+    if args.command == "translate" and (args.export_batch or args.import_batch):
+        if not BACKENDS[args.backend].supports_batch:
+            parser.error(f"the {args.backend} backend doesn't support batch jobs")
+
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+    if args.command in DAEMON_COMMANDS and not args.no_daemon:
+        exit_code = forward(sys.argv[1:], TRANSLATION_YAML_FILE, args.po_files_folder)
+        if exit_code is not None:
+            sys.exit(exit_code)
+    execute(args)
+
+
+def execute(args: argparse.Namespace, translator: Optional[Translator] = None) -> None:
+    """Run a command, then output the metrics collected if asked to."""
+    try:
+        run_command(args, translator)
+    finally:
+        if args.metrics or args.metrics_json:
+            metrics.print_summary()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+
+
+def run_command(
+    args: argparse.Namespace, translator: Optional[Translator] = None
+) -> None:
+    """Run the subcommand parsed from the command line, against `translator` if
+    provided instead of a translator loading what the command needs."""
+    if args.command == "cache":
+        run_cache_command(args)
+        return
+
+    if args.command == "serve":
+        from ai18n.daemon import serve
+
+        serve(TRANSLATION_YAML_FILE, args.po_files_folder, args.poll_interval)
+        return
+
     model = None
+    use_cache = False
     if args.command == "translate":
-        model = args.model
-    translator = Translator(OPENAI_API_KEY, model, TRANSLATION_YAML_FILE)
-
+        # Pseudo-translations shouldn't pass for the work of a model
+        model = "echo" if args.backend == "echo" else args.model
+        use_cache = not args.no_cache
+    if translator is None:
+        translator = Translator(
+            OPENAI_API_KEY, model, TRANSLATION_YAML_FILE, use_cache=use_cache, load=False
+        )
+    else:
+        translator.configure(model, use_cache)
     if args.command == "translate":
-        if not OPENAI_API_KEY:
+        translator.openai_translator.backend = get_backend(
+            args.backend,
+            OPENAI_API_KEY,
+            base_url=args.base_url,
+            max_connections=max(args.concurrency, 1),
+        )
+        translator.openai_translator.stream = args.stream
+
+    msgids = None
+    if args.command in ("translate", "po-push"):
+        changed_files = get_changed_files(args)
+        if changed_files is not None:
+            msgids = translator.select_by_changed_files(changed_files)
+
+    if args.command == "translate" and args.budget is not None:
+        if model not in MODEL_PRICES:
+            print(f"Error: no known price for model '{model}' to budget with.")
+            return
+
+    if args.command == "translate" and args.export_batch:
+        translator.load_for_translation(args.target_language, args.force, msgids)
+        translator.export_batch(
+            args.export_batch,
+            args.target_language,
+            args.message_regex,
+            args.force,
+            msgids,
+        )
+
+    elif args.command == "translate" and args.import_batch:
+        translator.load()
+        translator.import_batch(args.import_batch)
+        translator.save()
+
+    elif args.command == "translate" and args.plan:
+        translator.load_for_translation(args.target_language, args.force, msgids)
+        translator.plan(
+            args.target_language,
+            args.message_regex,
+            args.force,
+            msgids,
+            batch_size=args.batch_size,
+            priority=args.priority,
+            budget=args.budget,
+            concurrency=args.concurrency,
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+        )
+
+    elif args.command == "translate":
+        if args.backend == "openai" and not OPENAI_API_KEY and not args.base_url:
             print("Error: OPENAI_API_KEY environment variable is not set.")
             return
+        from ai18n.openai import RequestScheduler
+
+        translator.openai_translator.scheduler = RequestScheduler(
+            requests_per_minute=args.requests_per_minute,
+            tokens_per_minute=args.tokens_per_minute,
+            max_retries=args.max_retries,
+        )
+        translator.load_for_translation(args.target_language, args.force, msgids)
         translator.translate(
             args.target_language,
             args.dry_run,
             message_regex=args.message_regex,
             force=args.force,
+            concurrency=args.concurrency,
+            compact_every=args.compact_every,
+            batch_size=args.batch_size,
+            use_memory=args.translation_memory,
+            msgids=msgids,
+            priority=args.priority,
+            budget=args.budget,
         )
 
     elif args.command == "report":
-        translator.print_report()
+        if args.format == "table":
+            translator.load_for_report(args.by_prefix)
+            translator.print_report(args.by_prefix, args.prefix_depth)
+        else:
+            # Keep stdout for the report itself
+            with contextlib.redirect_stdout(sys.stderr):
+                translator.load_for_report(args.by_prefix)
+            translator.write_report(
+                sys.stdout, args.format, args.by_prefix, args.prefix_depth
+            )
 
     elif args.command == "po-pull":
         print(args.po_files_folder)
-        translator.load_po_files(args.po_files_folder)
-        translator.to_yaml()
+        translator.load()
+        translator.load_po_files(
+            args.po_files_folder, incremental=args.incremental, workers=args.workers
+        )
+        translator.save()
 
     elif args.command == "po-push":
-        translator.load_po_files(args.po_files_folder)
-        translator.push_all_po_files(args.prefer_ai, args.occurrence_regex)
+        translator.load_for_push(msgids)
+        # Only the loaded messages can have translations to push
+        translator.load_po_files(
+            args.po_files_folder, workers=args.workers, known_only=True
+        )
+        translator.push_all_po_files(
+            args.prefer_ai,
+            args.occurrence_regex,
+            msgids,
+            compile_mo=args.compile_mo,
+            compile_json=args.compile_json,
+        )
 
     elif args.command == "flush-ai":
+        translator.load()
         translator.flush_ai()
-        translator.to_yaml()
+        translator.save()
+
+    elif args.command == "export-yaml":
+        translator.load()
+        translator.to_yaml(args.yaml_file)
+
+    elif args.command == "import-yaml":
+        translator.load()
+        translator.from_yaml(args.yaml_file)
+        translator.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+import json
+import os
+from typing import Any, Dict, List
+
+from polib import POFile
+
+# Domain of the JSON catalogs the Superset frontend loads
+JSON_DOMAIN = "superset"
+DEFAULT_PLURAL_FORMS = "nplurals=2; plural=(n != 1)"
+
+
+def jed_catalog(po_file: POFile, domain: str = JSON_DOMAIN) -> Dict[str, Any]:
+    """The translations of a PO file in the Jed 1.x format, as `po2json` outputs it.
+
+    Untranslated, fuzzy and obsolete entries are left out, so that they fall back
+    to the msgid.
+    """
+    messages: Dict[str, Any] = {
+        "": {
+            "domain": domain,
+            "plural_forms": po_file.metadata.get("Plural-Forms", DEFAULT_PLURAL_FORMS),
+            "lang": po_file.metadata.get("Language", ""),
+        }
+    }
+    for entry in po_file:
+        if entry.obsolete or entry.fuzzy or not entry.msgid:
+            continue
+        msgstrs: List[str]
+        if entry.msgid_plural:
+            msgstrs = [entry.msgstr_plural[i] for i in sorted(entry.msgstr_plural)]
+        else:
+            msgstrs = [entry.msgstr]
+        if not any(msgstrs):
+            continue
+        key = f"{entry.msgctxt}\x04{entry.msgid}" if entry.msgctxt else entry.msgid
+        messages[key] = msgstrs
+    return {"domain": domain, "locale_data": {domain: messages}}
+
+
+def compile_po_file(
+    po_file: POFile, changed: bool = True, mo: bool = False, json_catalog: bool = False
+) -> List[str]:
+    """Write the compiled `.mo` and/or JSON catalog next to a PO file, from its
+    in-memory content. Unless it `changed`, only missing files get written.
+
+    Returns the paths written.
+    """
+    base = os.path.splitext(po_file.fpath)[0]
+    written = []
+    if mo and (changed or not os.path.exists(base + ".mo")):
+        po_file.save_as_mofile(base + ".mo")
+        written.append(base + ".mo")
+    if json_catalog and (changed or not os.path.exists(base + ".json")):
+        with open(base + ".json", "w", encoding="utf-8") as file:
+            json.dump(jed_catalog(po_file), file, ensure_ascii=False)
+        written.append(base + ".json")
+    for path in written:
+        print(f"Compiled {path}")
+    return written
@@ -6,6 +6,10 @@ conf: Dict[str, Any] = {
     "po_folder_root": "",
     "prompt_extra_context": "",
     "yaml_file": "",
+    "storage": "",
+    "cache_dir": "",
+    "backend": "",
+    "base_url": "",
     "main_language": "en",
     "target_languages": ["es", "fr", "it", "de"],
 }
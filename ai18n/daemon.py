@@ -0,0 +1,341 @@
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import traceback
+from typing import Any, Collection, Dict, List, Optional, TextIO, Tuple
+
+from polib import POFile
+
+from ai18n.metrics import metrics
+from ai18n.storage import CatalogStorage
+from ai18n.translator import Translator
+
+# Commands the CLI forwards to a running daemon
+DAEMON_COMMANDS = ("translate", "report", "po-pull", "po-push")
+
+Stat = Tuple[int, int]
+
+
+def socket_path(yaml_file: str) -> str:
+    """Socket of the daemon serving a catalog, one per catalog location.
+
+    It lives in the temp folder as socket paths are limited to ~100 characters.
+    """
+    location = os.path.abspath(yaml_file)
+    digest = hashlib.sha1(location.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"ai18n-{digest}.sock")
+
+
+def environment_digest() -> str:
+    """Digest of the environment variables commands depend on: the OpenAI client
+    settings and the `AI18N_*` configuration, both read when the CLI is imported.
+    """
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name.startswith(("OPENAI_", "AI18N_"))
+    }
+    return hashlib.sha256(json.dumps(env, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def file_stat(path: str) -> Stat:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def location_stat(location: str) -> Optional[Stat]:
+    """Stat of a catalog location, the latest one of its files for folders."""
+    if os.path.isdir(location):
+        stats = [
+            file_stat(entry.path) for entry in os.scandir(location) if entry.is_file()
+        ]
+        return (len(stats), max(mtime for _, mtime in stats)) if stats else None
+    if os.path.exists(location):
+        return file_stat(location)
+    return None
+
+
+class ResidentTranslator(Translator):
+    """Translator keeping the catalog and the parsed PO files in memory.
+
+    Commands run against it don't load anything: the catalog is only read again
+    when changed on disk by someone else, and only the PO files that changed get
+    parsed and merged again, as a continuous `po-pull`.
+    """
+
+    def __init__(self, yaml_file: str, po_folder: str) -> None:
+        # Commands run from the cwd of their client, the catalog must not follow
+        super().__init__(yaml_file=os.path.abspath(yaml_file), load=False)
+        self.po_folder = os.path.abspath(po_folder)
+        self.po_file_stats: Dict[str, Stat] = {}
+        self.catalog_stat: Optional[Stat] = None
+        self.reload()
+        self.refresh()
+
+    def load(
+        self,
+        msgids: Optional[Collection[str]] = None,
+        storage: Optional[CatalogStorage] = None,
+    ) -> None:
+        # The catalog is already in memory, only other storages get read
+        if storage is not None and storage is not self.storage:
+            super().load(msgids, storage)
+
+    def load_for_report(self, by_prefix: bool = False) -> None:
+        # Counting the messages in memory beats querying the storage
+        pass
+
+    def load_po_files(
+        self,
+        po_folder: str,
+        incremental: bool = False,
+        workers: int = 1,
+        known_only: bool = False,
+    ) -> None:
+        self.refresh()
+
+    def reload(self) -> None:
+        """Read the whole catalog again, merging the PO files in memory into it."""
+        self.messages = {}
+        super().load()
+        self.catalog_stat = location_stat(self.storage.location)
+        self.merge_all_po_files()
+
+    def refresh(self) -> List[str]:
+        """Parse and merge the PO files that changed since they were last seen,
+        saving the catalog if they changed since the last pull. Returns their paths.
+        """
+        filepaths = [
+            path
+            for path in self.get_po_files(self.po_folder)
+            if self.po_file_stats.get(path) != file_stat(path)
+        ]
+        if not filepaths:
+            return []
+        for filepath, po_file in zip(filepaths, self.parse_po_files(filepaths)):
+            self.po_file_stats[filepath] = file_stat(filepath)
+            lang = po_file.metadata["Language"]
+            self.po_files_dict[lang] = po_file
+            with metrics.timer("merge"):
+                self.merge_po_file(lang, po_file)
+        if self.po_manifest.record(filepaths):
+            self.save()
+        return filepaths
+
+    def poll(self) -> None:
+        """Pick up the changes made to the catalog and the PO files on disk."""
+        if location_stat(self.storage.location) != self.catalog_stat:
+            print(f"Catalog '{self.storage.location}' changed, reloading it")
+            self.reload()
+        self.refresh()
+
+    def save(self, storage: Optional[CatalogStorage] = None) -> None:
+        super().save(storage)
+        if storage is None or storage is self.storage:
+            self.catalog_stat = location_stat(self.storage.location)
+
+    def push_po_file(
+        self,
+        lang: str,
+        po_file: POFile,
+        prefer_ai: bool = False,
+        occurrence_regex: Optional[str] = None,
+        msgids: Optional[Collection[str]] = None,
+    ) -> bool:
+        changed = super().push_po_file(lang, po_file, prefer_ai, occurrence_regex, msgids)
+        if changed:
+            # Pushed translations are already in memory, they aren't merged back
+            self.po_file_stats[po_file.fpath] = file_stat(po_file.fpath)
+        return changed
+
+
+class StreamWriter(io.BufferedIOBase):
+    """Sends what a command prints to the client, tagged with the stream name."""
+
+    def __init__(self, stream: TextIO, name: str) -> None:
+        self.stream = stream
+        self.name = name
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        text = bytes(data).decode("utf-8", errors="replace")
+        if text:
+            send(self.stream, {self.name: text})
+        return len(data)
+
+
+def stream_writer(stream: TextIO, name: str) -> TextIO:
+    """Text stream sending every write to the client as it's made."""
+    return io.TextIOWrapper(
+        StreamWriter(stream, name), encoding="utf-8", write_through=True
+    )
+
+
+def send(stream: TextIO, data: Dict[str, Any]) -> None:
+    try:
+        stream.write(json.dumps(data) + "\n")
+        stream.flush()
+    except OSError:
+        # The client went away, let the command complete regardless
+        pass
+
+
+class CatalogDaemon:
+    """Serves the commands of the CLI against a resident translator over a unix
+    socket, one at a time, watching the catalog and PO files in between.
+
+    Requests and responses are JSON lines: the client sends its command line,
+    working directory and environment digest, the daemon answers with the output
+    of the command as it's printed, then its exit code. Clients with another
+    environment than the daemon's run their commands themselves.
+    """
+
+    def __init__(self, translator: ResidentTranslator, poll_interval: float = 1.0):
+        self.translator = translator
+        self.poll_interval = poll_interval
+        self.path = socket_path(translator.yaml_file)
+        self.stopped = False
+        self.environment = environment_digest()
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            if is_running(self.path):
+                raise RuntimeError(f"A daemon is already serving '{self.path}'")
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.path)
+            os.chmod(self.path, 0o600)
+            server.listen()
+            server.settimeout(self.poll_interval)
+            print(f"Serving '{self.translator.yaml_file}' on '{self.path}'")
+            while not self.stopped:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    self.translator.poll()
+                    continue
+                with connection:
+                    connection.settimeout(None)
+                    self.handle(connection)
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def handle(self, connection: socket.socket) -> None:
+        with connection.makefile("rw", encoding="utf-8") as stream:
+            try:
+                request = json.loads(stream.readline())
+            except ValueError:
+                return
+            po_folder = os.path.abspath(request.get("po_files_folder") or "")
+            if po_folder != self.translator.po_folder:
+                send(stream, {"unavailable": f"Serving '{self.translator.po_folder}'"})
+                return
+            if request.get("environment") != self.environment:
+                send(stream, {"unavailable": "Serving another environment"})
+                return
+            send(stream, {"exit": self.run(request, stream)})
+
+    def run(self, request: Dict[str, Any], stream: TextIO) -> int:
+        # Imported here as the CLI forwards its commands to this module
+        from ai18n.cli import build_parser, execute
+
+        cwd = os.getcwd()
+        stdout = stream_writer(stream, "stdout")
+        stderr = stream_writer(stream, "stderr")
+        # The handler set up when the daemon started logs to its own stderr
+        handler = logging.StreamHandler(stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root_logger = logging.getLogger()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            root_logger.addHandler(handler)
+            try:
+                args = build_parser().parse_args(request["argv"])
+                os.chdir(request.get("cwd") or cwd)
+                root_logger.setLevel(args.log_level)
+                metrics.reset()
+                self.translator.poll()
+                execute(args, self.translator)
+            except SystemExit as e:
+                return e.code if isinstance(e.code, int) else int(bool(e.code))
+            except Exception:
+                traceback.print_exc()
+                return 1
+            finally:
+                root_logger.removeHandler(handler)
+                os.chdir(cwd)
+        return 0
+
+
+def is_running(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def forward(
+    argv: List[str],
+    yaml_file: str,
+    po_folder: str,
+    stdout: Optional[TextIO] = None,
+    stderr: Optional[TextIO] = None,
+) -> Optional[int]:
+    """Run a command in the daemon serving the catalog, if any.
+
+    Returns the exit code of the command, None when no daemon could run it,
+    including daemons started with other settings in their environment.
+    """
+    path = socket_path(yaml_file)
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    outputs = {"stdout": stdout or sys.stdout, "stderr": stderr or sys.stderr}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return None
+        with client.makefile("rw", encoding="utf-8") as stream:
+            request = {
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "po_files_folder": os.path.abspath(po_folder),
+                "environment": environment_digest(),
+            }
+            stream.write(json.dumps(request) + "\n")
+            stream.flush()
+            for line in stream:
+                response = json.loads(line)
+                if "exit" in response:
+                    return int(response["exit"])
+                if "unavailable" in response:
+                    return None
+                for name, output in outputs.items():
+                    if name in response:
+                        output.write(response[name])
+                        output.flush()
+    # The daemon stopped before the command completed
+    return 1
+
+
+def serve(yaml_file: str, po_folder: str, poll_interval: float = 1.0) -> None:
+    # Exit cleanly, removing the socket, when terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    translator = ResidentTranslator(yaml_file, po_folder)
+    try:
+        CatalogDaemon(translator, poll_interval).serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped")
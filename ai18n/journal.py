@@ -0,0 +1,57 @@
+import json
+import os
+from typing import Dict
+
+from ai18n.message import Message
+
+
+class CheckpointJournal:
+    """Append-only JSON lines log of translated messages.
+
+    Each record holds the AI translations and metadata of one message, keyed on its
+    trimmed msgid. Appending a record is cheap compared to rewriting the whole YAML
+    file, and leftover records are replayed on the next load, so an interrupted run
+    resumes without losing work.
+    """
+
+    def __init__(self, yaml_file: str) -> None:
+        self.path = yaml_file + ".journal"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, message: Message) -> None:
+        record = {
+            "msgid": message.trimmed_msgid,
+            "ai_translations": message.ai_translations,
+            "metadata": message.metadata,
+        }
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def replay(self, messages: Dict[str, Message]) -> int:
+        """Apply the journal records on top of `messages`, returns the count applied."""
+        if not self.exists():
+            return 0
+        applied = 0
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash may leave a partially written trailing record
+                    print(f"Skipping unreadable journal record in '{self.path}'")
+                    continue
+                message = messages.get(record["msgid"])
+                if not message:
+                    continue
+                message.merge_ai_output(record.get("ai_translations") or {})
+                message.metadata.update(record.get("metadata") or {})
+                applied += 1
+        return applied
+
+    def clear(self) -> None:
+        if self.exists():
+            os.remove(self.path)
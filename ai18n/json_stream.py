@@ -0,0 +1,120 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Runs of string content up to the next quote or escape
+STRING_CONTENT_REGEX = re.compile(r'[^"\\]+')
+
+StreamedValue = Tuple[Tuple[str, ...], str]
+
+
+class JSONStreamParser:
+    """Incremental parser of a JSON object received in chunks.
+
+    Each string value is emitted as soon as its closing quote arrives, along with
+    the keys leading to it, eg `(("0", "fr"), "Bonjour")` for batch responses.
+    Prompts ask for objects of strings (or of objects of strings), so other values
+    are skipped. Anything before the opening brace, such as a markdown fence, is
+    ignored, as is anything after the closing one.
+
+    `result` holds every value parsed so far, which salvages what a truncated
+    response did contain, and `complete` tells whether the object got closed.
+    """
+
+    def __init__(self) -> None:
+        self.result: Dict[str, Any] = {}
+        self.complete = False
+        self.chunks: List[str] = []
+        # Objects being parsed, and the keys leading to the innermost one
+        self.stack: List[Dict[str, Any]] = []
+        self.path: List[str] = []
+        self.key: Optional[str] = None
+        self.expect_key = False
+        # Depth of the arrays (and objects within them) being skipped
+        self.skip_depth = 0
+        self.in_string = False
+        self.string_parts: List[str] = []
+        self.escape = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def parse(self, text: str) -> "JSONStreamParser":
+        self.feed(text)
+        return self
+
+    def feed(self, chunk: str) -> List[StreamedValue]:
+        """Parse a chunk of the response, returns the string values it completed."""
+        self.chunks.append(chunk)
+        values: List[StreamedValue] = []
+        i = 0
+        while i < len(chunk) and not self.complete:
+            if self.in_string:
+                i = self.feed_string(chunk, i, values)
+                continue
+            char = chunk[i]
+            i += 1
+            if not self.stack:
+                if char == "{":
+                    self.stack.append(self.result)
+                    self.expect_key = True
+            elif char == '"':
+                self.in_string = True
+                self.string_parts = []
+            elif self.skip_depth:
+                if char in "[{":
+                    self.skip_depth += 1
+                elif char in "]}":
+                    self.skip_depth -= 1
+            elif char == "[":
+                self.skip_depth = 1
+            elif char == "{":
+                if self.expect_key or self.key is None:
+                    # Objects as keys are malformed, skip them
+                    self.skip_depth = 1
+                    continue
+                obj: Dict[str, Any] = {}
+                self.stack[-1][self.key] = obj
+                self.stack.append(obj)
+                self.path.append(self.key)
+                self.expect_key = True
+            elif char == "}":
+                self.stack.pop()
+                if self.stack:
+                    self.path.pop()
+                else:
+                    self.complete = True
+            elif char == ":":
+                self.expect_key = False
+            elif char == ",":
+                self.expect_key = True
+        return values
+
+    def feed_string(self, chunk: str, i: int, values: List[StreamedValue]) -> int:
+        if self.escape:
+            self.string_parts.append(chunk[i])
+            self.escape = False
+            return i + 1
+        if match := STRING_CONTENT_REGEX.match(chunk, i):
+            self.string_parts.append(match.group())
+            return match.end()
+        if chunk[i] == "\\":
+            self.string_parts.append("\\")
+            self.escape = True
+            return i + 1
+        # Closing quote
+        self.in_string = False
+        raw = "".join(self.string_parts)
+        try:
+            text = json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            text = raw
+        if self.skip_depth:
+            pass
+        elif self.expect_key:
+            self.key = text
+        elif self.key is not None:
+            self.stack[-1][self.key] = text
+            values.append((tuple(self.path) + (self.key,), text))
+        return i + 1
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Union
+
+from ai18n.storage import catalog_fingerprint
+
+Fingerprint = Dict[str, Union[int, float, str]]
+
+
+class POManifest:
+    """Fingerprints (size, mtime, hash) of the PO files merged into the YAML file.
+
+    The manifest lives next to the YAML file and lets `po-pull` skip the PO files
+    that haven't changed since they were last merged. New fingerprints are only
+    written out once the YAML file holding the merged state has been saved, along
+    with the fingerprint of the YAML file itself.
+    """
+
+    def __init__(self, yaml_file: str) -> None:
+        self.yaml_file = yaml_file
+        self.path = yaml_file + ".manifest.json"
+        self.entries: Dict[str, Fingerprint] = {}
+        self.pending: Dict[str, Fingerprint] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            # The fingerprints only describe the YAML file they were saved along
+            # with: every PO file changed for a YAML file since replaced or removed
+            catalog = catalog_fingerprint(yaml_file)
+            if catalog is not None and data.get("catalog") == catalog:
+                self.entries = data.get("files") or {}
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def fingerprint(self, path: str) -> Fingerprint:
+        stat = os.stat(path)
+        known = self.entries.get(path)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            return known
+        return {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": self.hash_file(path),
+        }
+
+    def record(self, paths: List[str]) -> List[str]:
+        """Record the current fingerprint of `paths`, returns the ones that changed."""
+        changed = []
+        for path in paths:
+            fingerprint = self.fingerprint(path)
+            known = self.entries.get(path)
+            if not known or known["sha256"] != fingerprint["sha256"]:
+                changed.append(path)
+            self.pending[path] = fingerprint
+        return changed
+
+    def save(self) -> None:
+        """Write the fingerprints out, called whenever the YAML file got saved."""
+        if not self.pending and not self.entries:
+            return
+        self.entries.update(self.pending)
+        self.pending = {}
+        data = {"catalog": catalog_fingerprint(self.yaml_file), "files": self.entries}
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2, sort_keys=True)
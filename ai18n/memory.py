@@ -0,0 +1,87 @@
+import re
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set, Tuple
+
+from ai18n.message import Message
+
+PLACEHOLDER_REGEX = re.compile(r"%\(\w+\)[sdifr]|%[sdifr]|\{\w*\}")
+TRAILING_PUNCTUATION = ".:;?!… "
+
+
+def normalize_exact(text: str) -> str:
+    """Normalization under which two msgids can share the same translation."""
+    return " ".join(text.split())
+
+
+def normalize_fuzzy(text: str) -> str:
+    """Looser normalization, ignoring case, placeholder names and trailing
+    punctuation, used to find near-duplicates."""
+    text = PLACEHOLDER_REGEX.sub("{}", normalize_exact(text))
+    return text.casefold().rstrip(TRAILING_PUNCTUATION)
+
+
+def ngrams(text: str, n: int = 3) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i : i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class TranslationMemory:
+    """Index of the already translated messages, to reuse their translations.
+
+    Messages whose msgids only differ in whitespace share their translations as-is.
+    Near-duplicates (different case, punctuation or placeholder names, or a small
+    edit distance away) are looked up through a trigram index, and are meant to be
+    passed to the AI as references rather than copied over.
+    """
+
+    def __init__(self, messages: Iterable[Message]) -> None:
+        self.exact: Dict[str, List[Message]] = defaultdict(list)
+        self.fuzzy: Dict[str, List[Message]] = defaultdict(list)
+        self.index: Dict[str, Set[str]] = defaultdict(set)
+        for message in messages:
+            if not self.translations(message):
+                continue
+            self.exact[normalize_exact(message.msgid)].append(message)
+            key = normalize_fuzzy(message.msgid)
+            self.fuzzy[key].append(message)
+            for gram in ngrams(key):
+                self.index[gram].add(key)
+
+    @staticmethod
+    def translations(message: Message) -> Dict[str, str]:
+        """Best known translation per language, preferring the PO ones."""
+        translations = {k: v for k, v in message.ai_translations.items() if v}
+        translations.update({k: v for k, v in message.po_translations.items() if v})
+        return translations
+
+    def exact_matches(self, message: Message) -> Dict[str, str]:
+        """Translations of other messages that only differ in whitespace."""
+        translations: Dict[str, str] = {}
+        for other in self.exact.get(normalize_exact(message.msgid), []):
+            if other is not message:
+                for lang, translation in self.translations(other).items():
+                    translations.setdefault(lang, translation)
+        return translations
+
+    def lookup(
+        self, message: Message, limit: int = 3, threshold: float = 0.75
+    ) -> List[Tuple[float, Message]]:
+        """Most similar translated messages, with their similarity score."""
+        key = normalize_fuzzy(message.msgid)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in ngrams(key):
+            for candidate in self.index.get(gram, ()):
+                shared[candidate] += 1
+        # Only score the candidates sharing the most trigrams, scoring is costly
+        candidates = sorted(shared, key=lambda k: shared[k], reverse=True)[:20]
+        matches = []
+        for candidate in candidates:
+            score = SequenceMatcher(None, key, candidate).ratio()
+            if score < threshold:
+                continue
+            for other in self.fuzzy[candidate]:
+                if other is not message:
+                    matches.append((score, other))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches[:limit]
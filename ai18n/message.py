@@ -1,11 +1,31 @@
 import datetime
-from collections import defaultdict
-from typing import Any, Dict, Optional, Set
+import re
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from ai18n.config import conf
 
+WORD_REGEX = re.compile(r"\b\w+\b")
+
+
+def intern_keys(data: Dict[str, str]) -> Dict[str, str]:
+    """Same dict, with keys shared with every other dict using the same ones."""
+    return {sys.intern(k): v for k, v in data.items()}
+
 
 class Message:
+    # Catalogs hold hundreds of thousands of messages, slots save a dict per message
+    __slots__ = (
+        "msgid",
+        "trimmed_msgid",
+        "occurances",
+        "po_translations",
+        "ai_translations",
+        "metadata",
+        "flags",
+        "_word_count",
+    )
+
     def __init__(
         self,
         msgid: str,
@@ -23,7 +43,9 @@ class Message:
             metadata if metadata else {}
         )  # Metadata (e.g., model used, last execution time)
         self.trimmed_msgid = self.normalize_message(msgid)
-        self.flags = defaultdict(set, flags or {})
+        # Only the languages with flags have an entry, see `add_flags`
+        self.flags: Dict[str, Set[str]] = {k: v for k, v in (flags or {}).items() if v}
+        self._word_count: Optional[int] = None
 
     @classmethod
     def normalize_message(cls, message: str) -> str:
@@ -41,21 +63,38 @@ class Message:
     def update_message(self, normalized_message: str) -> None:
         self.msgid = normalized_message
         self.trimmed_msgid = self.normalize_message(normalized_message)
+        self._word_count = None
+
+    @property
+    def word_count(self) -> int:
+        """Number of words in the msgid, counted once."""
+        if self._word_count is None:
+            self._word_count = len(WORD_REGEX.findall(self.msgid))
+        return self._word_count
 
     def update_metadata(self, model_used: str, execution_time: datetime.datetime) -> None:
-        self.metadata["model_used"] = model_used
+        self.metadata["model_used"] = sys.intern(model_used)
         self.metadata["last_executed"] = execution_time.isoformat()
 
+    def add_flags(self, lang: str, flags: Iterable[str]) -> None:
+        flags = set(flags)
+        if flags:
+            self.flags.setdefault(sys.intern(lang), set()).update(flags)
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Message":
         flags = data.get("flags", {})
-        flags = {lang: set(flags[lang]) for lang in flags.keys()}
+        flags = {sys.intern(lang): set(flags[lang]) for lang in flags.keys()}
+        metadata = intern_keys(data.get("metadata") or {})
+        if isinstance(metadata.get("model_used"), str):
+            metadata["model_used"] = sys.intern(metadata["model_used"])
         return cls(
             msgid=data["msgid"],
-            po_translations=data.get("po_translations", {}),
-            ai_translations=data.get("ai_translations", {}),
-            metadata=data.get("metadata", {}),
-            occurances=set(data.get("occurances", [])),
+            po_translations=intern_keys(data.get("po_translations") or {}),
+            ai_translations=intern_keys(data.get("ai_translations") or {}),
+            metadata=metadata,
+            # Occurrences repeat across many messages, share the strings
+            occurances={sys.intern(o) for o in data.get("occurances", [])},
             flags=flags,
         )
 
@@ -75,6 +114,12 @@ class Message:
             for lang in conf["target_languages"]
         )
 
+    def missing_languages(self, lang: Optional[str] = None) -> List[str]:
+        """Languages this message requires a translation for, among `lang` if
+        provided or the target languages otherwise."""
+        languages = [lang] if lang else conf["target_languages"]
+        return [lang for lang in languages if self.requires_translation(lang)]
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "trimmed_msgid": self.trimmed_msgid,
@@ -93,4 +138,4 @@ class Message:
     def merge_ai_output(self, ai_translations: Dict[str, str]) -> None:
         for lang, translation in ai_translations.items():
             if translation:
-                self.ai_translations[lang] = translation
+                self.ai_translations[sys.intern(lang)] = translation
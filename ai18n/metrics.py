@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    """Timings and counters collected over a run.
+
+    Phases accumulate wall-clock time across calls, counters are plain totals,
+    and API latencies are kept individually to report percentiles. Marks record
+    when an event first happened, in seconds since the run started or since the
+    event's clock was started. Everything is guarded by a lock as API calls may
+    run in worker threads.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.phases: Dict[str, float] = defaultdict(float)
+            self.counters: Dict[str, int] = defaultdict(int)
+            self.latencies: List[float] = []
+            self.marks: Dict[str, float] = {}
+            self.started = time.perf_counter()
+            # When the clocks of some marks started, if not with the run
+            self.clocks: Dict[str, float] = {}
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.phases[phase] += elapsed
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[counter] += value
+
+    def record_latency(self, seconds: float) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def start_clock(self, event: str) -> None:
+        """Measure the next mark of `event` from now, forgetting any previous one."""
+        with self.lock:
+            self.clocks[event] = time.perf_counter()
+            self.marks.pop(event, None)
+
+    def mark(self, event: str) -> None:
+        with self.lock:
+            if event not in self.marks:
+                started = self.clocks.get(event, self.started)
+                self.marks[event] = time.perf_counter() - started
+
+    def record_usage(self, usage: Any) -> None:
+        """Count the tokens reported in the `usage` of an API response."""
+        if usage is None:
+            return
+        self.increment("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+        self.increment("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies = list(self.latencies)
+            return {
+                "phases": {k: round(v, 6) for k, v in self.phases.items()},
+                "counters": dict(self.counters),
+                "marks": {k: round(v, 6) for k, v in self.marks.items()},
+                "api_latency": {
+                    "count": len(latencies),
+                    "p50": percentile(latencies, 0.5),
+                    "p95": percentile(latencies, 0.95),
+                    "total": round(sum(latencies), 6),
+                },
+            }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2, sort_keys=True)
+        print(f"Metrics written to '{path}'")
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        print("Metrics Summary:")
+        print(f"{'Metric':<24} | {'Value':>12}")
+        print("=" * 40)
+        for phase, seconds in sorted(summary["phases"].items()):
+            print(f"{phase + ' (s)':<24} | {seconds:>12.3f}")
+        for event, seconds in sorted(summary["marks"].items()):
+            print(f"{event + ' (s)':<24} | {seconds:>12.3f}")
+        latency = summary["api_latency"]
+        if latency["count"]:
+            print(f"{'api calls':<24} | {latency['count']:>12}")
+            print(f"{'api latency p50 (s)':<24} | {latency['p50']:>12.3f}")
+            print(f"{'api latency p95 (s)':<24} | {latency['p95']:>12.3f}")
+        for counter, value in sorted(summary["counters"].items()):
+            print(f"{counter:<24} | {value:>12}")
+
+
+# Shared by the translator and the CLI for the duration of a run
+metrics = Metrics()
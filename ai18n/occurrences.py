@@ -0,0 +1,123 @@
+import json
+import os
+import posixpath
+import re
+import subprocess
+from collections import defaultdict
+from typing import Collection, Dict, Iterable, List, Optional, Set
+
+from ai18n.message import Message
+from ai18n.storage import catalog_fingerprint
+
+
+def normalize_path(path: str) -> str:
+    return posixpath.normpath(path.strip().replace("\\", "/"))
+
+
+def occurrence_prefix(path: str, depth: int = 1) -> str:
+    """First `depth` folders of an occurrence path, eg `superset-frontend`."""
+    parts = normalize_path(path).split("/")[:-1]
+    return "/".join(parts[:depth]) or "."
+
+
+def changed_files_from_diff(text: str) -> List[str]:
+    """Paths touched by a unified diff, or listed one per line as output by
+    `git diff --name-only`."""
+    paths: List[str] = []
+    if git_headers := re.findall(r"^diff --git a/(.+) b/(.+)$", text, re.MULTILINE):
+        for old_path, new_path in git_headers:
+            paths += [old_path, new_path]
+    elif headers := re.findall(r"^(?:\+\+\+|---) (.+?)(?:\t.*)?$", text, re.MULTILINE):
+        paths = [path for path in headers if path != "/dev/null"]
+    else:
+        paths = [line.strip() for line in text.splitlines() if line.strip()]
+    return sorted(set(paths))
+
+
+def git_changed_files(since: str) -> List[str]:
+    """Paths changed in the local git checkout since `since`, working tree included."""
+    result = subprocess.run(
+        ["git", "diff", "--name-only", since],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return changed_files_from_diff(result.stdout)
+
+
+class OccurrenceIndex:
+    """Reverse index from the source files referencing messages to their msgids.
+
+    The index lives next to the catalog, and is updated whenever the catalog is
+    saved after new occurrences got merged. It lets commands work on the strings
+    referenced by a few changed source files without scanning every message.
+
+    The index records the fingerprint of the catalog it was saved along with, so
+    that it doesn't outlive changes made to the catalog by other means.
+    """
+
+    def __init__(self, yaml_file: str) -> None:
+        self.yaml_file = yaml_file
+        self.path = yaml_file + ".occurrences.json"
+        self.paths: Dict[str, Set[str]] = defaultdict(set)
+        self.catalog_fingerprint: Optional[List[int]] = None
+        self.loaded = False
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> None:
+        if not self.loaded and self.exists():
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.catalog_fingerprint = data.get("catalog")
+            for path, msgids in (data.get("paths") or {}).items():
+                self.paths[path] |= set(msgids)
+        self.loaded = True
+
+    def is_current(self) -> bool:
+        """Whether the index was saved along with the catalog as it is on disk."""
+        if not self.exists():
+            return False
+        self.load()
+        fingerprint = catalog_fingerprint(self.yaml_file)
+        return fingerprint is not None and self.catalog_fingerprint == fingerprint
+
+    def update(self, messages: Iterable[Message], rebuild: bool = False) -> None:
+        """Index the occurrences of `messages`, on top of the saved ones unless
+        `rebuild`."""
+        if rebuild:
+            self.paths.clear()
+            self.loaded = True
+        self.load()
+        for message in messages:
+            for occurrence in message.occurances:
+                self.paths[normalize_path(occurrence)].add(message.trimmed_msgid)
+
+    def save(self) -> None:
+        self.catalog_fingerprint = catalog_fingerprint(self.yaml_file)
+        paths = {path: sorted(msgids) for path, msgids in sorted(self.paths.items())}
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"catalog": self.catalog_fingerprint, "paths": paths},
+                file,
+                ensure_ascii=False,
+            )
+
+    def lookup(self, changed_files: Collection[str]) -> Set[str]:
+        """Trimmed msgids of the messages referenced by any of the changed files.
+
+        Occurrences are usually relative to where the strings were extracted from
+        (eg `superset-frontend/src/...`) while changed files are relative to the
+        repository, so a path matches when either one is a suffix of the other.
+        """
+        self.load()
+        msgids: Set[str] = set()
+        for changed in {normalize_path(path) for path in changed_files}:
+            if changed in self.paths:
+                msgids |= self.paths[changed]
+                continue
+            for path, path_msgids in self.paths.items():
+                if path.endswith("/" + changed) or changed.endswith("/" + path):
+                    msgids |= path_msgids
+        return msgids
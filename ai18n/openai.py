@@ -1,29 +1,241 @@
 import datetime
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, List, Optional
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple, TypeVar
 
-from jinja2 import Environment, FileSystemLoader
-from openai import OpenAI
+from jinja2 import Environment, FileSystemLoader, Template
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
 
+from ai18n.backend import Backend, BatchBackend, get_backend, SYSTEM_MESSAGE
+from ai18n.cache import ResponseCache
 from ai18n.config import conf
+from ai18n.json_stream import JSONStreamParser
+from ai18n.memory import TranslationMemory
 from ai18n.message import Message
+from ai18n.metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 MAX_TOKEN = 4096
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a string, assuming ~4 characters per token."""
+    return len(text) // 4 + 1
+
+
+def estimate_completion_tokens(message: Message, languages: List[str]) -> int:
+    """Rough number of output tokens needed to translate a message.
+
+    Non-latin scripts take more tokens than the english source, and every
+    language adds a JSON key and quoting, hence the generous factor and overhead.
+    """
+    return len(languages) * (estimate_tokens(message.msgid) * 2 + 8)
+
+
+def max_tokens_for(messages: List[Message], languages: List[str]) -> int:
+    """Completion token limit for a prompt, with headroom over the estimate."""
+    estimate = sum(estimate_completion_tokens(m, languages) for m in messages)
+    return min(MAX_TOKEN, estimate * 2 + 64)
+
+
+T = TypeVar("T")
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse durations as found in rate limit headers ("20ms", "1.5s", "6m0s")."""
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class RequestScheduler:
+    """Paces requests to the API and retries the ones that fail transiently.
+
+    - keeps the requests and tokens sent over the last minute within the
+      `requests_per_minute` / `tokens_per_minute` budgets, if provided
+    - pauses everyone when rate limit headers say a budget is exhausted
+    - retries rate limited, timed out and 5xx requests with jittered exponential
+      backoff, honoring `retry-after` headers
+    - adapts the number of requests in flight with AIMD: additive increase on
+      success, halved on rate limiting, never above `max_concurrency`
+    """
+
+    RETRYABLE_ERRORS = (
+        RateLimitError,
+        APITimeoutError,
+        APIConnectionError,
+        InternalServerError,
+    )
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: int = 1,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests: Deque[float] = deque()
+        self.tokens: Deque[Tuple[float, int]] = deque()
+        self.set_max_concurrency(max_concurrency)
+
+    def set_max_concurrency(self, max_concurrency: int) -> None:
+        with self.condition:
+            self.max_concurrency = max(1, max_concurrency)
+            self.concurrency_limit = float(self.max_concurrency)
+            self.condition.notify_all()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Seconds to wait before a request of `tokens` fits in the budgets."""
+        while self.requests and self.requests[0] <= now - 60:
+            self.requests.popleft()
+        while self.tokens and self.tokens[0][0] <= now - 60:
+            self.tokens.popleft()
+        wait = self.paused_until - now
+        if self.requests_per_minute and len(self.requests) >= self.requests_per_minute:
+            wait = max(wait, self.requests[0] + 60 - now)
+        if self.tokens_per_minute and self.tokens:
+            used = sum(count for _, count in self.tokens)
+            if used + tokens > self.tokens_per_minute:
+                wait = max(wait, self.tokens[0][0] + 60 - now)
+        return wait
+
+    def acquire(self, tokens: int) -> None:
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                wait = self.wait_time(tokens, now)
+                if wait <= 0 and self.in_flight < int(self.concurrency_limit):
+                    break
+                self.condition.wait(timeout=wait if wait > 0 else None)
+            self.in_flight += 1
+            self.requests.append(now)
+            self.tokens.append((now, tokens))
+
+    def release(self, rate_limited: bool = False) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            else:
+                self.concurrency_limit = min(
+                    float(self.max_concurrency),
+                    self.concurrency_limit + 1 / self.concurrency_limit,
+                )
+            self.condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Pause until the budget resets when the API says it's exhausted."""
+        for budget in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{budget}")
+            reset = headers.get(f"x-ratelimit-reset-{budget}")
+            if remaining is not None and reset and remaining.strip() == "0":
+                seconds = parse_duration(reset)
+                if seconds:
+                    self.pause(seconds)
+
+    def retry_after(self, headers: Mapping[str, str]) -> Optional[float]:
+        if value := headers.get("retry-after-ms"):
+            seconds = parse_duration(value)
+            return seconds / 1000 if seconds is not None else None
+        if value := headers.get("retry-after"):
+            return parse_duration(value)
+        return None
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        # Full jitter, so that concurrent requests don't retry in lockstep
+        return random.uniform(delay / 2, delay)
+
+    def call(self, request: Callable[[], T], tokens: int) -> T:
+        """Run `request` within the budgets, retrying transient failures."""
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = request()
+            except self.RETRYABLE_ERRORS as e:
+                rate_limited = isinstance(e, RateLimitError)
+                self.release(rate_limited=rate_limited)
+                headers = e.response.headers if isinstance(e, APIStatusError) else {}
+                self.update_from_headers(headers)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, self.retry_after(headers))
+                attempt += 1
+                metrics.increment("api_retries")
+                print(
+                    f"Request failed ({type(e).__name__}), "
+                    f"retrying in {delay:.1f}s ({attempt}/{self.max_retries})"
+                )
+                if rate_limited:
+                    # Hold back every request, not just this one
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            except Exception:
+                self.release()
+                raise
+            self.release()
+            return result
+
+
 class OpenAIMessageTranslator:
     def __init__(
         self,
-        api_key: str,
+        api_key: Optional[str] = None,
         model: Optional[str] = None,
         temperature: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        backend: Optional[Backend] = None,
     ) -> None:
         self.model: str = model or "gpt-4"
         self.temperature: float = temperature or 0.3
-        self.client = OpenAI(
-            api_key=api_key
-        )  # Instantiate client once in the constructor
+        self.cache = cache
+        self.scheduler = scheduler or RequestScheduler()
+        # When set, similar already-translated strings are passed as references
+        self.memory: Optional[TranslationMemory] = None
+        self.backend = backend or get_backend(api_key=api_key)
+        # Whether responses get streamed, and called with each translation as soon
+        # as it's streamed in
+        self.stream = False
+        self.on_translation: Optional[Callable[[Message, str, str], None]] = None
         module_dir = os.path.dirname(os.path.abspath(__file__))
 
         # Set the template directory relative to the current module
@@ -34,74 +246,468 @@ class OpenAIMessageTranslator:
 
         print(f"Using template folder: {template_dir}")
 
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+        # Templates are compiled once, without checking them for changes on each use
+        self.env = Environment(loader=FileSystemLoader(template_dir), auto_reload=False)
+        self.templates: Dict[str, Template] = {}
+        # Parts of the context shared by every prompt of the run
+        self.static_context: Dict[str, Any] = {
+            "extra_context": conf.get("prompt_extra_context"),
+        }
+        self.locales: Dict[Tuple[str, ...], str] = {}
+
+    def languages_for(
+        self, message: Message, lang: Optional[str] = None, force: bool = False
+    ) -> List[str]:
+        """Languages to request for a message, the missing ones unless forced."""
+        if force:
+            return [lang] if lang else list(conf["target_languages"])
+        return message.missing_languages(lang)
+
+    def get_template(self, name: str) -> Template:
+        if name not in self.templates:
+            self.templates[name] = self.env.get_template(name)
+        return self.templates[name]
+
+    def base_context(self, languages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Context shared by the prompts requesting the same languages."""
+        languages = languages or conf["target_languages"]
+        key = tuple(languages)
+        if key not in self.locales:
+            self.locales[key] = ", ".join(languages)
+        return {
+            **self.static_context,
+            "languages": languages,
+            "locales": self.locales[key],
+        }
 
-    def build_prompt(self, message: Message) -> str:
+    def build_prompt(
+        self, message: Message, languages: Optional[List[str]] = None
+    ) -> str:
         """Create a translation prompt for the OpenAI API using Jinja2."""
-        template = self.env.get_template("prompt.jinja")
+        template = self.get_template("prompt.jinja")
 
         # Prepare the context for rendering the template
         context = {
-            "languages": conf["target_languages"],
+            **self.base_context(languages),
             "msgid": message.msgid,
             "occurances": message.occurances or [],
-            "extra_context": conf.get("prompt_extra_context"),
             "other_languages": {
                 lang: translation
                 for lang, translation in message.po_translations.items()
                 if translation
             },
+            "references": self.get_references(message),
         }
 
         # Render the template with the provided context
-        prompt = template.render(context) or ""
+        with metrics.timer("prompt_render"):
+            prompt = template.render(context) or ""
 
         # Output the generated prompt for debugging purposes
-        print("-=-" * 20)
-        print(prompt)
-        print("-=-" * 20)
+        logger.debug("%s\n%s\n%s", "-=-" * 20, prompt, "-=-" * 20)
 
         return prompt
 
-    def execute_prompt(self, message: Message, dry_run: bool = False) -> Dict[str, str]:
-        prompt = self.build_prompt(message)
-
-        response_text = "{}"
-        if not dry_run:
-            # Use the chat completion endpoint for the chat models
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional translator proficient in multiple languages.",
+    def get_references(self, message: Message) -> List[Dict[str, Any]]:
+        """Similar strings from the translation memory, with their translations."""
+        if not self.memory:
+            return []
+        references = []
+        for _, other in self.memory.lookup(message):
+            translations = TranslationMemory.translations(other)
+            references.append(
+                {
+                    "msgid": other.msgid,
+                    "translations": {
+                        lang: translations[lang]
+                        for lang in conf["target_languages"]
+                        if lang in translations
+                    },
+                }
+            )
+        return references
+
+    def build_batch_prompt(
+        self, messages: List[Message], languages: Optional[List[str]] = None
+    ) -> str:
+        """Create a single prompt translating several messages at once."""
+        template = self.get_template("batch_prompt.jinja")
+
+        context = {
+            **self.base_context(languages),
+            "messages": [
+                {
+                    "msgid": message.msgid,
+                    "occurances": sorted(message.occurances),
+                    "other_languages": {
+                        lang: translation
+                        for lang, translation in message.po_translations.items()
+                        if translation
                     },
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=MAX_TOKEN,
-                temperature=self.temperature,
+                    "references": self.get_references(message),
+                }
+                for message in messages
+            ],
+        }
+        with metrics.timer("prompt_render"):
+            prompt = template.render(context) or ""
+
+        logger.debug("%s\n%s\n%s", "-=-" * 20, prompt, "-=-" * 20)
+
+        return prompt
+
+    def complete(self, prompt: str, max_tokens: int = MAX_TOKEN) -> str:
+        """Send a prompt to the backend, returns the response text."""
+
+        def request() -> str:
+            start = time.perf_counter()
+            completion = self.backend.complete(
+                prompt, self.model, max_tokens, self.temperature
             )
+            metrics.record_latency(time.perf_counter() - start)
+            self.scheduler.update_from_headers(completion.headers)
+            metrics.record_usage(completion.usage)
+            return completion.text
 
-            response_text = response.choices[0].message.content.strip()
-        print(response_text)
-        print("-=-" * 20)
+        tokens = estimate_tokens(SYSTEM_MESSAGE + prompt) + max_tokens
+        return self.scheduler.call(request, tokens)
+
+    def complete_stream(
+        self,
+        prompt: str,
+        max_tokens: int = MAX_TOKEN,
+        on_value: Optional[Callable[[Tuple[str, ...], str], None]] = None,
+    ) -> JSONStreamParser:
+        """Stream the response to a prompt, calling `on_value` with each string
+        value of the JSON object as soon as it's complete."""
+
+        def request() -> JSONStreamParser:
+            start = time.perf_counter()
+            parser = JSONStreamParser()
+            headers: Mapping[str, str] = {}
+            for chunk in self.backend.stream(
+                prompt, self.model, max_tokens, self.temperature
+            ):
+                headers = chunk.headers
+                for path, value in parser.feed(chunk.text):
+                    if on_value:
+                        on_value(path, value)
+                metrics.record_usage(chunk.usage)
+            metrics.record_latency(time.perf_counter() - start)
+            self.scheduler.update_from_headers(headers)
+            return parser
+
+        tokens = estimate_tokens(SYSTEM_MESSAGE + prompt) + max_tokens
+        return self.scheduler.call(request, tokens)
+
+    def parse_response(self, response_text: str) -> Dict[str, Any]:
+        return self.decode_response(response_text)[0]
+
+    def decode_response(self, response_text: str) -> Tuple[Dict[str, Any], bool]:
+        """Parse a JSON object response, returns it and whether it was complete.
+
+        What a truncated or malformed object contained is salvaged.
+        """
+        logger.debug("%s\n%s", response_text, "-=-" * 20)
         translations = {}
         try:
             translations = json.loads(response_text)  # Expect the response in JSON format
         except json.JSONDecodeError:
-            print("Error: Unable to parse JSON from OpenAI response.")
+            parser = JSONStreamParser().parse(response_text)
+            if not parser.complete:
+                return self.salvage(parser), False
+            # A complete object within markdown fences or other text
+            translations = parser.result
         except Exception as e:
             print(f"Error: {e}")
+            metrics.increment("json_parse_failures")
+        if not isinstance(translations, dict):
+            print("Error: Expected a JSON object in the OpenAI response.")
+            metrics.increment("json_parse_failures")
+            return {}, False
+        return translations, True
+
+    @staticmethod
+    def salvage(parser: JSONStreamParser) -> Dict[str, Any]:
+        """What an incomplete streamed or parsed response contained."""
+        if parser.result:
+            print("Warning: incomplete JSON in the OpenAI response, salvaging it.")
+            metrics.increment("json_salvaged_responses")
+        else:
+            print("Error: Unable to parse JSON from OpenAI response.")
+            metrics.increment("json_parse_failures")
+        return parser.result
+
+    def request_json(
+        self,
+        prompt: str,
+        max_tokens: int = MAX_TOKEN,
+        on_value: Optional[Callable[[Tuple[str, ...], str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Get the parsed JSON response to a prompt, from the cache when possible.
+
+        When streaming, `on_value` is called with each string value as soon as
+        it's complete. Incomplete responses are salvaged, but not cached.
+        """
+        return self.request_json_complete(prompt, max_tokens, on_value)[0]
+
+    def request_json_complete(
+        self,
+        prompt: str,
+        max_tokens: int = MAX_TOKEN,
+        on_value: Optional[Callable[[Tuple[str, ...], str], None]] = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Same as `request_json`, also returning whether the response was complete."""
+        key = None
+        if self.cache:
+            key = self.cache.make_key(
+                self.model, self.temperature, SYSTEM_MESSAGE, prompt
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info("Using cached response")
+                metrics.increment("cache_hits")
+                return cached, True
+        if self.stream:
+            parser = self.complete_stream(prompt, max_tokens, on_value)
+            logger.debug("%s\n%s", parser.text, "-=-" * 20)
+            response = parser.result if parser.complete else self.salvage(parser)
+            complete = parser.complete
+        else:
+            response, complete = self.decode_response(self.complete(prompt, max_tokens))
+        if self.cache and key and response and complete:
+            self.cache.set(key, self.model, response)
+        return response, complete
+
+    def commit_streamed(
+        self,
+        messages: List[Message],
+        languages: List[str],
+        path: Tuple[str, ...],
+        translation: str,
+    ) -> None:
+        """Hand a streamed translation over as soon as it's complete, its path
+        being `(lang,)` for single prompts and `(index, lang)` for batches."""
+        if not self.on_translation or not translation:
+            return
+        if len(messages) == 1 and len(path) == 1:
+            message, lang = messages[0], path[0]
+        elif len(path) == 2 and path[0].isdigit() and int(path[0]) < len(messages):
+            message, lang = messages[int(path[0])], path[1]
+        else:
+            return
+        if lang in languages:
+            self.on_translation(message, lang, translation)
+
+    @staticmethod
+    def filter_languages(
+        translations: Dict[str, Any], languages: List[str]
+    ) -> Dict[str, str]:
+        """Keep the string translations for the requested languages only."""
+        return {
+            lang: translation
+            for lang, translation in translations.items()
+            if lang in languages and isinstance(translation, str)
+        }
+
+    @staticmethod
+    def custom_id(message: Message) -> str:
+        """Stable identifier of a message in batch request and result files."""
+        return hashlib.sha256(message.trimmed_msgid.encode("utf-8")).hexdigest()
+
+    @property
+    def batch_backend(self) -> BatchBackend:
+        if not isinstance(self.backend, BatchBackend):
+            raise ValueError(
+                f"The {self.backend.name} backend doesn't support batch jobs"
+            )
+        return self.backend
+
+    def build_batch_request(
+        self, message: Message, languages: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Chat completion request for a message, in the batch input file format."""
+        languages = languages or list(conf["target_languages"])
+        return self.batch_backend.batch_request(
+            self.custom_id(message),
+            self.build_prompt(message, languages),
+            self.model,
+            max_tokens_for([message], languages),
+            self.temperature,
+        )
+
+    def parse_batch_result(self, result: Dict[str, Any]) -> Dict[str, str]:
+        """Translations from one line of a batch output file."""
+        content = self.batch_backend.batch_result_text(result)
+        if content is None:
+            print(f"Error: batch request {result.get('custom_id')} failed")
+            return {}
+        translations = self.parse_response(content)
+        return {k: v for k, v in translations.items() if isinstance(v, str)}
+
+    def execute_prompt(
+        self,
+        message: Message,
+        dry_run: bool = False,
+        languages: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        languages = languages or list(conf["target_languages"])
+        prompt = self.build_prompt(message, languages)
+        if dry_run:
+            return self.parse_response("{}")
+        response, complete = self.request_json_complete(
+            prompt,
+            max_tokens_for([message], languages),
+            lambda path, value: self.commit_streamed([message], languages, path, value),
+        )
+        translations = self.filter_languages(response, languages)
+        missing = [lang for lang in languages if lang not in translations]
+        if not complete and translations and missing:
+            # Cut short, only request what's missing, which shrinks on each attempt
+            print(f"Requesting {', '.join(missing)} missing from the response")
+            metrics.increment("missing_languages_requested", len(missing))
+            translations.update(self.execute_prompt(message, languages=missing))
         return translations
 
+    def execute_batch_prompt(
+        self,
+        messages: List[Message],
+        dry_run: bool = False,
+        languages: Optional[List[str]] = None,
+    ) -> Dict[str, Dict[str, str]]:
+        """Translate several messages with a single prompt.
+
+        Returns the translations keyed on the position of the message in the batch,
+        as a string, mirroring the JSON object the prompt asks for.
+        """
+        languages = languages or list(conf["target_languages"])
+        prompt = self.build_batch_prompt(messages, languages)
+        if dry_run:
+            results = self.parse_response("{}")
+        else:
+            results = self.request_json(
+                prompt,
+                max_tokens_for(messages, languages),
+                lambda path, value: self.commit_streamed(
+                    messages, languages, path, value
+                ),
+            )
+        return {
+            index: self.filter_languages(translations, languages)
+            for index, translations in results.items()
+            if isinstance(translations, dict)
+        }
+
+    def make_batches(
+        self,
+        messages: List[Message],
+        batch_size: int = 1,
+        lang: Optional[str] = None,
+        force: bool = False,
+    ) -> List[List[Message]]:
+        """Group messages into batches of up to `batch_size` messages.
+
+        Messages are grouped by the set of languages they need, so that all the
+        messages of a batch share the same prompt shape. Batches are also cut short
+        when the expected output would not fit in MAX_TOKEN, so that the JSON
+        response doesn't get truncated.
+        """
+        groups: Dict[Tuple[str, ...], List[Message]] = {}
+        for message in messages:
+            languages = tuple(self.languages_for(message, lang, force))
+            groups.setdefault(languages, []).append(message)
+
+        batches: List[List[Message]] = []
+        for languages, group in groups.items():
+            batch: List[Message] = []
+            batch_tokens = 0
+            for message in group:
+                tokens = estimate_completion_tokens(message, list(languages))
+                if batch and (
+                    len(batch) >= batch_size or batch_tokens + tokens > MAX_TOKEN
+                ):
+                    batches.append(batch)
+                    batch, batch_tokens = [], 0
+                batch.append(message)
+                batch_tokens += tokens
+            if batch:
+                batches.append(batch)
+        return batches
+
+    def fetch_translations(
+        self,
+        message: Message,
+        force: bool = False,
+        dry_run: bool = False,
+        lang: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """Get the AI translations for a message without merging them into it.
+
+        Only the languages the message is missing are requested, or just `lang`
+        if provided.
+        """
+        languages = self.languages_for(message, lang, force)
+        if languages:
+            return self.execute_prompt(message, dry_run=dry_run, languages=languages)
+        return {}
+
+    def fetch_batch_translations(
+        self,
+        messages: List[Message],
+        force: bool = False,
+        dry_run: bool = False,
+        lang: Optional[str] = None,
+    ) -> List[Tuple[Message, Dict[str, str]]]:
+        """Get the AI translations for a batch of messages, using a single prompt.
+
+        The messages are expected to need the same languages, as grouped by
+        `make_batches`. Messages missing from the batch response are retried on
+        their own.
+        """
+        pending = [msg for msg in messages if self.languages_for(msg, lang, force)]
+        if len(pending) <= 1:
+            return [
+                (msg, self.fetch_translations(msg, force, dry_run, lang))
+                for msg in messages
+            ]
+
+        languages = self.languages_for(pending[0], lang, force)
+        results = self.execute_batch_prompt(pending, dry_run, languages)
+        translations_by_msgid: Dict[str, Dict[str, str]] = {}
+        for i, message in enumerate(pending):
+            translations = results.get(str(i)) or {}
+            missing = [lang for lang in languages if lang not in translations]
+            if missing and not dry_run:
+                if translations:
+                    print(
+                        f"Message {i} lacks {', '.join(missing)} in the batch "
+                        "response, requesting them alone"
+                    )
+                else:
+                    print(f"Message {i} missing from batch response, retrying it alone")
+                translations.update(self.execute_prompt(message, languages=missing))
+            translations_by_msgid[message.trimmed_msgid] = translations
+        return [
+            (msg, translations_by_msgid.get(msg.trimmed_msgid, {})) for msg in messages
+        ]
+
+    def apply_translations(
+        self, message: Message, translations: Dict[str, str], dry_run: bool = False
+    ) -> None:
+        if translations and not dry_run:
+            message.merge_ai_output(translations)
+            message.update_metadata(self.model, datetime.datetime.now())
+            metrics.mark("first_translation")
+
     def translate_message(
-        self, message: Message, force: bool = False, dry_run: bool = False
+        self,
+        message: Message,
+        force: bool = False,
+        dry_run: bool = False,
+        lang: Optional[str] = None,
     ) -> None:
-        if message.requires_translation() or force:
-            translations = self.execute_prompt(message, dry_run=dry_run)
-            if translations and not dry_run:
-                message.merge_ai_output(translations)
-                message.update_metadata(self.model, datetime.datetime.now())
+        translations = self.fetch_translations(message, force, dry_run, lang)
+        self.apply_translations(message, translations, dry_run=dry_run)
 
     def translate(
         self, messages: List[Message], force: bool = False, dry_run: bool = False
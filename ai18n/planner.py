@@ -0,0 +1,186 @@
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, TYPE_CHECKING
+
+from ai18n.backend import SYSTEM_MESSAGE
+from ai18n.message import Message
+
+if TYPE_CHECKING:
+    # The CLI reads the priorities and prices, without needing the openai SDK
+    from ai18n.openai import OpenAIMessageTranslator
+
+# USD per million input and output tokens
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+# Rough request latency: time to first token, then output tokens per second
+REQUEST_OVERHEAD_SECONDS = 0.5
+OUTPUT_TOKENS_PER_SECOND = 50.0
+
+FRONTEND_REGEX = re.compile(r"(^|/)[^/]*frontend[^/]*/|\.(jsx?|tsx?)$")
+
+
+def is_frontend(message: Message) -> bool:
+    return any(FRONTEND_REGEX.search(occurrence) for occurrence in message.occurances)
+
+
+# Scores of the messages to translate first, the highest ones first
+PRIORITIES: Dict[str, Callable[[Message], Tuple[int, int]]] = {
+    "occurrences": lambda m: (len(m.occurances), m.word_count),
+    "words": lambda m: (m.word_count, len(m.occurances)),
+    "frontend": lambda m: (int(is_frontend(m)), len(m.occurances)),
+}
+
+
+def prioritize(messages: List[Message], priority: str) -> List[Message]:
+    return sorted(messages, key=PRIORITIES[priority], reverse=True)
+
+
+def prioritize_batches(
+    batches: List[List[Message]], priority: str
+) -> List[List[Message]]:
+    """Order batches by their highest priority message, as batches are grouped by
+    the languages their messages need."""
+    score = PRIORITIES[priority]
+    return sorted(batches, key=lambda batch: max(map(score, batch)), reverse=True)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class RequestEstimate(NamedTuple):
+    messages: int
+    prompt_tokens: int
+    completion_tokens: int
+    # Completion token limit of the request, bounding its cost
+    max_tokens: int
+
+
+class TranslationPlanner:
+    """Estimates the tokens, cost and time the translation requests would take,
+    without calling the API.
+
+    Prompts are rendered as they would be sent, and tokens counted with the same
+    ~4 characters per token approximation the scheduler budgets with.
+    """
+
+    def __init__(
+        self,
+        openai_translator: "OpenAIMessageTranslator",
+        lang: Optional[str] = None,
+        force: bool = False,
+    ) -> None:
+        self.openai_translator = openai_translator
+        self.lang = lang
+        self.force = force
+
+    def estimate(self, batch: List[Message]) -> RequestEstimate:
+        from ai18n.openai import (
+            estimate_completion_tokens,
+            estimate_tokens,
+            max_tokens_for,
+        )
+
+        languages = self.openai_translator.languages_for(batch[0], self.lang, self.force)
+        if len(batch) > 1:
+            prompt = self.openai_translator.build_batch_prompt(batch, languages)
+        else:
+            prompt = self.openai_translator.build_prompt(batch[0], languages)
+        return RequestEstimate(
+            len(batch),
+            estimate_tokens(SYSTEM_MESSAGE + prompt),
+            sum(estimate_completion_tokens(m, languages) for m in batch),
+            max_tokens_for(batch, languages),
+        )
+
+    @staticmethod
+    def cost(estimates: List[RequestEstimate], model: str) -> Optional[float]:
+        """Estimated cost in USD, None for models without a known price."""
+        if model not in MODEL_PRICES:
+            return None
+        input_price, output_price = MODEL_PRICES[model]
+        prompt_tokens = sum(e.prompt_tokens for e in estimates)
+        completion_tokens = sum(e.completion_tokens for e in estimates)
+        return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+    def within_budget(
+        self, batches: List[List[Message]], budget: float, model: str
+    ) -> List[List[Message]]:
+        """The first batches whose estimated cost fits in `budget` USD."""
+        if model not in MODEL_PRICES:
+            raise ValueError(
+                f"No known price for model '{model}', expected one of: "
+                f"{', '.join(MODEL_PRICES)}"
+            )
+        spent = 0.0
+        selected = []
+        for batch in batches:
+            spent += self.cost([self.estimate(batch)], model) or 0.0
+            if spent > budget:
+                break
+            selected.append(batch)
+        return selected
+
+    @staticmethod
+    def wall_clock_seconds(
+        estimates: List[RequestEstimate],
+        concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ) -> float:
+        """Time the requests would take with `concurrency` requests in flight,
+        within the rate limits if provided."""
+        busy = sum(
+            REQUEST_OVERHEAD_SECONDS + e.completion_tokens / OUTPUT_TOKENS_PER_SECOND
+            for e in estimates
+        )
+        seconds = busy / max(concurrency, 1)
+        if requests_per_minute:
+            seconds = max(seconds, len(estimates) / requests_per_minute * 60)
+        if tokens_per_minute:
+            # The scheduler budgets the prompt and the completion token limit
+            tokens = sum(e.prompt_tokens + e.max_tokens for e in estimates)
+            seconds = max(seconds, tokens / tokens_per_minute * 60)
+        return seconds
+
+    def print_plan(
+        self,
+        batches: List[List[Message]],
+        concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ) -> None:
+        estimates = [self.estimate(batch) for batch in batches]
+        prompt_tokens = sum(e.prompt_tokens for e in estimates)
+        completion_tokens = sum(e.completion_tokens for e in estimates)
+        print(
+            f"Plan: {sum(e.messages for e in estimates)} messages "
+            f"in {len(estimates)} requests"
+        )
+        print(f"Estimated tokens: {prompt_tokens} prompt, {completion_tokens} completion")
+        models = list(MODEL_PRICES)
+        if self.openai_translator.model not in models:
+            models.insert(0, self.openai_translator.model)
+        print(f"{'Model':<16} | {'Cost (USD)':>10}")
+        print("=" * 29)
+        for model in models:
+            cost = self.cost(estimates, model)
+            marker = "*" if model == self.openai_translator.model else " "
+            amount = f"{cost:>10.4f}" if cost is not None else f"{'unknown':>10}"
+            print(f"{model + marker:<16} | {amount}")
+        seconds = self.wall_clock_seconds(
+            estimates, concurrency, requests_per_minute, tokens_per_minute
+        )
+        print(
+            f"Estimated wall-clock time with {concurrency} concurrent requests: "
+            f"{format_duration(seconds)}"
+        )
@@ -0,0 +1,461 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Type,
+)
+
+from ai18n.config import conf
+from ai18n.journal import CheckpointJournal
+from ai18n.message import Message, WORD_REGEX
+from ai18n.yaml_io import dump_messages, dump_yaml, load_yaml
+
+
+class TranslationCounts(NamedTuple):
+    """What translation statistics are computed from."""
+
+    total_strings: int
+    total_words: int
+    orphaned: int
+    # Translated strings and words per language, from PO files then PO+AI
+    languages: Dict[str, List[int]]
+
+
+class CatalogStorage(ABC):
+    """Where the messages of a Translator are loaded from and saved to.
+
+    Storages that can answer the `select_*` and `count_translations` queries
+    without a full load override them, they return None otherwise.
+    """
+
+    def __init__(self, location: str) -> None:
+        self.location = location
+
+    @abstractmethod
+    def load(self, msgids: Optional[Collection[str]] = None) -> Dict[str, Message]:
+        """Load the messages, or only the ones in `msgids` if the backend can."""
+
+    @abstractmethod
+    def save(self, messages: Dict[str, Message]) -> None:
+        pass
+
+    @abstractmethod
+    def checkpoint(self, messages: Iterable[Message]) -> None:
+        """Persist changes to a few messages, cheaper than a full save if possible."""
+
+    def select_requiring_translation(self, languages: List[str]) -> Optional[List[str]]:
+        """Trimmed msgids missing a translation in any of `languages`.
+
+        Returns None when the backend can't answer without a full load.
+        """
+        return None
+
+    def select_with_ai_translations(self) -> Optional[List[str]]:
+        """Trimmed msgids with AI translations, None if it requires a full load."""
+        return None
+
+    def select_translated(self) -> Optional[List[str]]:
+        """Trimmed msgids with any translation, None if it requires a full load."""
+        return None
+
+    def count_translations(self, languages: List[str]) -> Optional[TranslationCounts]:
+        """Translation counts of the whole catalog, None if it requires a full load."""
+        return None
+
+
+class YAMLStorage(CatalogStorage):
+    """The whole catalog in one YAML file, with an append-only checkpoint journal."""
+
+    def __init__(self, location: str) -> None:
+        super().__init__(location)
+        self.journal = CheckpointJournal(location)
+
+    def load(self, msgids: Optional[Collection[str]] = None) -> Dict[str, Message]:
+        print(f"Loading translations from YAML file '{self.location}'")
+        try:
+            with open(self.location, "r", encoding="utf-8") as file:
+                data = load_yaml(file)
+        except FileNotFoundError:
+            print("YAML file not found. Creating a new one.")
+            data = {}
+        messages = {}
+        for message_data in (data or {}).get("messages") or []:
+            message = Message.from_dict(message_data)
+            messages[message.trimmed_msgid] = message
+        if self.journal.exists():
+            applied = self.journal.replay(messages)
+            print(f"Replayed {applied} checkpointed messages from '{self.journal.path}'")
+        return messages
+
+    def save(self, messages: Dict[str, Message]) -> None:
+        print(f"Saving translations to YAML file '{self.location}'")
+        with open(self.location, "w", encoding="utf-8") as file:
+            dump_messages(messages, file)
+        # Everything journaled so far is now part of the YAML file
+        self.journal.clear()
+
+    def checkpoint(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            self.journal.append(message)
+
+
+class SQLiteStorage(CatalogStorage):
+    """Catalog stored in a SQLite database, with indexed tables for messages,
+    translations per language, occurrences and flags.
+
+    Saving upserts the messages it is given and never deletes the others, so a
+    partially loaded catalog can be saved back safely.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            trimmed_msgid TEXT PRIMARY KEY,
+            msgid TEXT NOT NULL,
+            metadata TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS translations (
+            trimmed_msgid TEXT NOT NULL,
+            source TEXT NOT NULL,
+            lang TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            translation TEXT NOT NULL,
+            PRIMARY KEY (trimmed_msgid, source, lang)
+        );
+        CREATE INDEX IF NOT EXISTS translations_lang ON translations (lang, source);
+        CREATE TABLE IF NOT EXISTS occurrences (
+            trimmed_msgid TEXT NOT NULL,
+            path TEXT NOT NULL,
+            PRIMARY KEY (trimmed_msgid, path)
+        );
+        CREATE INDEX IF NOT EXISTS occurrences_path ON occurrences (path);
+        CREATE TABLE IF NOT EXISTS flags (
+            trimmed_msgid TEXT NOT NULL,
+            lang TEXT NOT NULL,
+            flag TEXT NOT NULL,
+            PRIMARY KEY (trimmed_msgid, lang, flag)
+        );
+    """
+    TRANSLATION_SOURCES = {"po": "po_translations", "ai": "ai_translations"}
+
+    def __init__(self, location: str) -> None:
+        super().__init__(location)
+        self.connection = sqlite3.connect(location)
+        self.connection.executescript(self.SCHEMA)
+
+    def _select(
+        self, query: str, msgids: Optional[Collection[str]], order_by: str = ""
+    ) -> List[Any]:
+        if msgids is not None:
+            query += " WHERE trimmed_msgid IN (SELECT trimmed_msgid FROM selected)"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return self.connection.execute(query).fetchall()
+
+    def load(self, msgids: Optional[Collection[str]] = None) -> Dict[str, Message]:
+        print(f"Loading translations from SQLite database '{self.location}'")
+        if msgids is not None:
+            # Join against a temporary table rather than binding thousands of parameters
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS selected (trimmed_msgid TEXT PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM selected")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO selected VALUES (?)", [(m,) for m in msgids]
+            )
+        messages: Dict[str, Message] = {}
+        for trimmed_msgid, msgid, metadata in self._select(
+            "SELECT trimmed_msgid, msgid, metadata FROM messages", msgids
+        ):
+            messages[trimmed_msgid] = Message(msgid=msgid, metadata=json.loads(metadata))
+        for trimmed_msgid, source, lang, translation in self._select(
+            "SELECT trimmed_msgid, source, lang, translation FROM translations",
+            msgids,
+            order_by="trimmed_msgid, source, position",
+        ):
+            translations = getattr(
+                messages[trimmed_msgid], self.TRANSLATION_SOURCES[source]
+            )
+            # Rows come with their own copy of each string, share the repeated ones
+            translations[sys.intern(lang)] = translation
+        for trimmed_msgid, path in self._select(
+            "SELECT trimmed_msgid, path FROM occurrences", msgids
+        ):
+            messages[trimmed_msgid].occurances.add(sys.intern(path))
+        for trimmed_msgid, lang, flag in self._select(
+            "SELECT trimmed_msgid, lang, flag FROM flags", msgids
+        ):
+            messages[trimmed_msgid].add_flags(lang, [flag])
+        return messages
+
+    def save(self, messages: Dict[str, Message]) -> None:
+        print(f"Saving translations to SQLite database '{self.location}'")
+        self.checkpoint(messages.values())
+
+    def checkpoint(self, messages: Iterable[Message]) -> None:
+        with self.connection:
+            for message in messages:
+                self._upsert(message)
+
+    def _upsert(self, message: Message) -> None:
+        key = message.trimmed_msgid
+        self.connection.execute(
+            "INSERT OR REPLACE INTO messages VALUES (?, ?, ?)",
+            (key, message.msgid, json.dumps(message.metadata, ensure_ascii=False)),
+        )
+        for table in ("translations", "occurrences", "flags"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE trimmed_msgid = ?", (key,)
+            )
+        rows: List[Any] = []
+        for source, attribute in self.TRANSLATION_SOURCES.items():
+            translations = getattr(message, attribute)
+            for position, (lang, translation) in enumerate(translations.items()):
+                rows.append((key, source, lang, position, translation))
+        self.connection.executemany(
+            "INSERT INTO translations VALUES (?, ?, ?, ?, ?)", rows
+        )
+        self.connection.executemany(
+            "INSERT INTO occurrences VALUES (?, ?)",
+            [(key, path) for path in message.occurances],
+        )
+        self.connection.executemany(
+            "INSERT INTO flags VALUES (?, ?, ?)",
+            [
+                (key, lang, flag)
+                for lang, flags in message.flags.items()
+                for flag in flags
+            ],
+        )
+
+    def select_requiring_translation(self, languages: List[str]) -> Optional[List[str]]:
+        placeholders = ", ".join("?" for _ in languages)
+        rows = self.connection.execute(
+            f"""
+            SELECT m.trimmed_msgid FROM messages m
+            LEFT JOIN translations t
+                ON t.trimmed_msgid = m.trimmed_msgid
+                AND t.lang IN ({placeholders})
+                AND t.translation != ''
+            GROUP BY m.trimmed_msgid
+            HAVING COUNT(DISTINCT t.lang) < ?
+            """,
+            (*languages, len(set(languages))),
+        )
+        return [row[0] for row in rows]
+
+    def select_with_ai_translations(self) -> Optional[List[str]]:
+        rows = self.connection.execute(
+            "SELECT DISTINCT trimmed_msgid FROM translations WHERE source = 'ai'"
+        )
+        return [row[0] for row in rows]
+
+    def select_translated(self) -> Optional[List[str]]:
+        rows = self.connection.execute(
+            "SELECT DISTINCT trimmed_msgid FROM translations WHERE translation != ''"
+        )
+        return [row[0] for row in rows]
+
+    def count_translations(self, languages: List[str]) -> Optional[TranslationCounts]:
+        # Words are counted like `Message.word_count` does, once per message
+        self.connection.create_function(
+            "word_count",
+            1,
+            lambda text: len(WORD_REGEX.findall(text)),
+            deterministic=True,
+        )
+        self.connection.execute("DROP TABLE IF EXISTS temp.counted")
+        self.connection.execute(
+            """
+            CREATE TEMP TABLE counted AS
+            SELECT trimmed_msgid, word_count(msgid) AS words FROM messages
+            """
+        )
+        total_strings, total_words, orphaned = self.connection.execute(
+            """
+            SELECT COUNT(*), COALESCE(SUM(words), 0), COALESCE(SUM(NOT EXISTS (
+                SELECT 1 FROM occurrences o WHERE o.trimmed_msgid = c.trimmed_msgid
+            )), 0)
+            FROM counted c
+            """
+        ).fetchone()
+        counts = {lang: [0, 0, 0, 0] for lang in languages}
+        placeholders = ", ".join("?" for _ in languages)
+        # The AI coverage falls back on PO translations, so it counts either one
+        rows = self.connection.execute(
+            f"""
+            SELECT t.lang, SUM(t.po), SUM(t.po * c.words), COUNT(*), SUM(c.words)
+            FROM (
+                SELECT trimmed_msgid, lang, MAX(source = 'po') AS po
+                FROM translations
+                WHERE translation != '' AND lang IN ({placeholders})
+                GROUP BY trimmed_msgid, lang
+            ) t
+            JOIN counted c ON c.trimmed_msgid = t.trimmed_msgid
+            GROUP BY t.lang
+            """,
+            languages,
+        )
+        for lang, *lang_counts in rows:
+            counts[lang] = lang_counts
+        self.connection.execute("DROP TABLE temp.counted")
+        return TranslationCounts(total_strings, total_words, orphaned, counts)
+
+
+class ShardedYAMLStorage(CatalogStorage):
+    """Catalog split into several YAML files in a folder.
+
+    `core.yaml` holds the msgids, occurrences, flags and metadata, and there's one
+    `<lang>.yaml` shard per language with its PO and AI translations. Only the
+    shards whose content changed get rewritten.
+    """
+
+    CORE_SHARD = "core"
+    TRANSLATION_ATTRIBUTES = ("po_translations", "ai_translations")
+
+    def __init__(self, location: str) -> None:
+        super().__init__(location)
+        self.journal = CheckpointJournal(self.shard_path(self.CORE_SHARD))
+        self.loaded_languages: Set[str] = set()
+        # Digest of each shard's content as last read or written, to spot dirty ones
+        self.digests: Dict[str, str] = {}
+
+    def empty_shard(self) -> Dict[str, Dict[str, str]]:
+        return {attribute: {} for attribute in self.TRANSLATION_ATTRIBUTES}
+
+    def shard_path(self, shard: str) -> str:
+        return os.path.join(self.location, f"{shard}.yaml")
+
+    def shard_languages(self) -> List[str]:
+        shards = glob.glob(os.path.join(self.location, "*.yaml"))
+        languages = [os.path.splitext(os.path.basename(path))[0] for path in shards]
+        return sorted(lang for lang in languages if lang != self.CORE_SHARD)
+
+    def read_shard(self, shard: str) -> Dict[str, Any]:
+        try:
+            with open(self.shard_path(shard), "r", encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return {}
+        self.digests[shard] = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return load_yaml(io.StringIO(text)) or {}
+
+    def write_shard(self, shard: str, data: Dict[str, Any]) -> bool:
+        """Write a shard if its content changed, returns whether it was written."""
+        stream = io.StringIO()
+        dump_yaml(data, stream)
+        text = stream.getvalue()
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if self.digests.get(shard) == digest:
+            return False
+        with open(self.shard_path(shard), "w", encoding="utf-8") as file:
+            file.write(text)
+        self.digests[shard] = digest
+        return True
+
+    def load(self, msgids: Optional[Collection[str]] = None) -> Dict[str, Message]:
+        print(f"Loading translations from YAML shards in '{self.location}'")
+        if not os.path.isdir(self.location):
+            print("Shards folder not found. Creating a new one.")
+        messages = {}
+        for message_data in self.read_shard(self.CORE_SHARD).get("messages") or []:
+            message = Message.from_dict(message_data)
+            messages[message.trimmed_msgid] = message
+        for lang in self.shard_languages():
+            shard = self.read_shard(lang)
+            for attribute in self.TRANSLATION_ATTRIBUTES:
+                for msgid, translation in (shard.get(attribute) or {}).items():
+                    if msgid in messages:
+                        getattr(messages[msgid], attribute)[lang] = translation
+            self.loaded_languages.add(lang)
+        if self.journal.exists():
+            applied = self.journal.replay(messages)
+            print(f"Replayed {applied} checkpointed messages from '{self.journal.path}'")
+        return messages
+
+    def save(self, messages: Dict[str, Message]) -> None:
+        print(f"Saving translations to YAML shards in '{self.location}'")
+        os.makedirs(self.location, exist_ok=True)
+        core = []
+        shards: Dict[str, Dict[str, Dict[str, str]]] = {
+            lang: self.empty_shard() for lang in self.loaded_languages
+        }
+        for key in sorted(messages):
+            message_data = messages[key].to_dict()
+            for attribute in self.TRANSLATION_ATTRIBUTES:
+                for lang, translation in message_data.pop(attribute).items():
+                    if lang not in shards:
+                        shards[lang] = self.empty_shard()
+                    shards[lang][attribute][key] = translation
+            core.append(message_data)
+
+        written = int(self.write_shard(self.CORE_SHARD, {"messages": core}))
+        for lang, shard in sorted(shards.items()):
+            if lang not in self.loaded_languages and os.path.exists(
+                self.shard_path(lang)
+            ):
+                # This shard wasn't loaded, lay our translations over what's on disk
+                existing = self.read_shard(lang)
+                for attribute in self.TRANSLATION_ATTRIBUTES:
+                    merged = existing.get(attribute) or {}
+                    merged.update(shard[attribute])
+                    shard[attribute] = {k: merged[k] for k in sorted(merged)}
+            written += self.write_shard(lang, shard)
+        print(f"Rewrote {written} of {len(shards) + 1} shards")
+        self.journal.clear()
+
+    def checkpoint(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            self.journal.append(message)
+
+
+STORAGE_BACKENDS: Dict[str, Type[CatalogStorage]] = {
+    "yaml": YAMLStorage,
+    "sqlite": SQLiteStorage,
+    "sharded": ShardedYAMLStorage,
+}
+
+
+def get_storage(location: str, backend: Optional[str] = None) -> CatalogStorage:
+    """Get the storage for a catalog location, inferring the backend if needed."""
+    backend = backend or conf.get("storage")
+    if not backend:
+        extension = os.path.splitext(location)[1].lower()
+        if extension in (".db", ".sqlite", ".sqlite3"):
+            backend = "sqlite"
+        elif os.path.isdir(location) or location.endswith(os.sep):
+            backend = "sharded"
+        else:
+            backend = "yaml"
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(
+            f"Unknown storage backend '{backend}', "
+            f"expected one of: {', '.join(STORAGE_BACKENDS)}"
+        )
+    return STORAGE_BACKENDS[backend](location)
+
+
+def catalog_fingerprint(location: str) -> Optional[List[int]]:
+    """Size and modification time of a catalog, to tell whether it changed since,
+    summed and latest of its shards for sharded catalogs. None without a catalog.
+    """
+    if os.path.isdir(location):
+        paths = glob.glob(os.path.join(location, "*.yaml"))
+    else:
+        paths = [location] if os.path.exists(location) else []
+    stats = [os.stat(path) for path in paths]
+    if not stats:
+        return None
+    return [sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats)]
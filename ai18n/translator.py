@@ -1,32 +1,102 @@
+import csv
+import datetime
+import json
 import os
 import random
 import re
 import sys
-from typing import Any, Dict, List, Optional, Set
-
-import yaml
-from polib import POFile, pofile
-
+import threading
+from concurrent.futures import as_completed, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    TYPE_CHECKING,
+)
+
+from polib import POEntry, POFile, pofile
+
+from ai18n.cache import ResponseCache
+from ai18n.compile import compile_po_file
 from ai18n.config import conf
-from ai18n.message import Message
-from ai18n.openai import OpenAIMessageTranslator
+from ai18n.manifest import POManifest
+from ai18n.memory import TranslationMemory
+from ai18n.message import Message, WORD_REGEX
+from ai18n.metrics import metrics
+from ai18n.occurrences import occurrence_prefix, OccurrenceIndex
+from ai18n.storage import (
+    CatalogStorage,
+    get_storage,
+    TranslationCounts,
+    YAMLStorage,
+)
+
+if TYPE_CHECKING:
+    # Imported lazily as it pulls the openai SDK and jinja2, which most commands
+    # don't need
+    from ai18n.openai import OpenAIMessageTranslator
 
 
 class Translator:
     def __init__(
-        self, api_key: str = None, model: str = None, yaml_file: str = None
+        self,
+        api_key: str = None,
+        model: str = None,
+        yaml_file: str = None,
+        use_cache: bool = False,
+        storage: Optional[CatalogStorage] = None,
+        load: bool = True,
     ) -> None:
         self.messages: Dict[str, Message] = {}
+        # Location of the catalog, a YAML file unless another storage is configured
         self.yaml_file = yaml_file or "./translations.yaml"
+        self.storage = storage or get_storage(self.yaml_file)
         self.po_files_dict: Dict[str, POFile] = {}
         self.api_key = api_key
-
-        if self.yaml_file:
-            self.from_yaml(self.yaml_file)
-        if self.api_key:
-            self.openai_translator = OpenAIMessageTranslator(
-                api_key=self.api_key, model=model
+        self.model = model
+        self.use_cache = use_cache
+        self.po_manifest = POManifest(self.yaml_file)
+        self.occurrence_index = OccurrenceIndex(self.yaml_file)
+        # Whether occurrences were merged since the index was last updated
+        self.occurrences_changed = False
+        # Whether the whole catalog got loaded, which partial loads can skip
+        self.fully_loaded = False
+        # Counts aggregated by the storage, for reports without loading the catalog
+        self.storage_counts: Optional[TranslationCounts] = None
+        self._openai_translator: Optional["OpenAIMessageTranslator"] = None
+        # Guards the messages while translations get streamed in by worker threads
+        self.lock = threading.Lock()
+
+        if load:
+            self.load()
+
+    @property
+    def openai_translator(self) -> "OpenAIMessageTranslator":
+        if self._openai_translator is None:
+            from ai18n.openai import OpenAIMessageTranslator
+
+            self._openai_translator = OpenAIMessageTranslator(
+                api_key=self.api_key,
+                model=self.model,
+                cache=ResponseCache() if self.use_cache else None,
             )
+        return self._openai_translator
+
+    @openai_translator.setter
+    def openai_translator(self, openai_translator: "OpenAIMessageTranslator") -> None:
+        self._openai_translator = openai_translator
+
+    def configure(self, model: Optional[str] = None, use_cache: bool = False) -> None:
+        """Change the model and cache to translate with, for long-lived translators."""
+        self.model = model
+        self.use_cache = use_cache
+        # Created again with these settings when next needed
+        self._openai_translator = None
 
     def from_dict(self, data: Dict[str, Any]) -> None:
         messages = data.get("messages") or []
@@ -41,41 +111,118 @@ class Translator:
             f"referencing {len(languages)} languages"
         )
 
-    def from_yaml(self, yaml_file: Optional[str] = None) -> None:
-        print(f"Loading translations from YAML file '{yaml_file}'")
-        yaml_location = yaml_file or self.yaml_file
-        try:
-            with open(yaml_location, "r") as file:
-                data = yaml.safe_load(file)
-        except FileNotFoundError:
-            print("YAML file not found. Creating a new one.")
-            data = {"messages": {}}
-        return self.from_dict(data)
-
-    def to_dict(self) -> Dict[str, Any]:
-        sorted_keys = sorted(self.messages.keys())
-        return {"messages": [self.messages[k].to_dict() for k in sorted_keys]}
-
-    def to_yaml(self, yaml_file: Optional[str] = None) -> None:
-        yaml_location = yaml_file or self.yaml_file
-        print(f"Saving translations to YAML file '{yaml_location}'")
-        data = self.to_dict()
-
-        def export_yaml() -> None:
-            with open(yaml_location, "w", encoding="utf-8") as file:
-                yaml.dump(data, file, allow_unicode=True, sort_keys=False)
+    def load(
+        self,
+        msgids: Optional[Collection[str]] = None,
+        storage: Optional[CatalogStorage] = None,
+    ) -> None:
+        """Load messages from the catalog storage.
+
+        `msgids` restricts what gets loaded, for storages that support partial loads.
+        """
+        with metrics.timer("load"):
+            messages = (storage or self.storage).load(msgids)
+        self.messages.update(messages)
+        if storage is not None and storage is not self.storage:
+            self.occurrences_changed = True
+        elif msgids is None:
+            self.fully_loaded = True
+        seen_languages: Set[str] = set()
+        for message in messages.values():
+            seen_languages |= set(message.po_translations.keys())
+            seen_languages |= set(message.ai_translations.keys())
+        print(
+            f"Loaded {len(messages)} messages "
+            f"referencing {len(seen_languages)} languages"
+        )
 
+    def load_for_translation(
+        self,
+        lang: Optional[str] = None,
+        force: bool = False,
+        only: Optional[Collection[str]] = None,
+    ) -> None:
+        """Load the messages `translate` may pick, all of them if the storage can't
+        select them on its own. `only` restricts them to some trimmed msgids.
+
+        Translations in every language get loaded, as prompts pass them along as
+        references.
+        """
+        if self.fully_loaded:
+            return
+        msgids = None
+        if not force:
+            languages = [lang] if lang else conf["target_languages"]
+            msgids = self.storage.select_requiring_translation(languages)
+        self.load(restrict(msgids, only))
+
+    def load_for_push(self, only: Optional[Collection[str]] = None) -> None:
+        """Load the messages `po-push` may export, ie those with AI translations."""
+        if self.fully_loaded:
+            return
+        self.load(restrict(self.storage.select_with_ai_translations(), only))
+
+    def select_by_changed_files(self, changed_files: Collection[str]) -> Set[str]:
+        """Trimmed msgids of the messages referenced by any of the changed files.
+
+        The occurrence index is built from the whole catalog if missing or older
+        than the catalog, which is then kept loaded rather than loaded again.
+        """
+        if not self.occurrence_index.is_current():
+            print(f"Building the occurrence index '{self.occurrence_index.path}'")
+            self.load()
+            self.occurrence_index.update(self.messages.values(), rebuild=True)
+            self.occurrence_index.save()
+        msgids = self.occurrence_index.lookup(changed_files)
+        print(f"{len(changed_files)} changed files reference {len(msgids)} messages")
+        return msgids
+
+    def save(self, storage: Optional[CatalogStorage] = None) -> None:
+        storage = storage or self.storage
+        # An index matching the catalog before the save still matches it after
+        index_current = storage is self.storage and self.occurrence_index.is_current()
         try:
-            export_yaml()
+            with metrics.timer("save"):
+                storage.save(self.messages)
         except KeyboardInterrupt:
             print(
                 "Export interrupted. Retrying to prevent partial file... Please hold on for a sec."
             )
-            export_yaml()
-            print("Export completed to '{yaml_location}', exiting now...")
+            storage.save(self.messages)
+            print(f"Export completed to '{storage.location}', exiting now...")
             sys.exit(1)
 
-        print(f"Export completed to '{yaml_location}'")
+        if storage is self.storage:
+            self.po_manifest.save()
+            # Otherwise, an outdated index gets rebuilt the next time it's needed
+            if self.occurrences_changed and (index_current or self.fully_loaded):
+                self.occurrence_index.update(
+                    self.messages.values(), rebuild=self.fully_loaded
+                )
+                self.occurrence_index.save()
+            elif index_current:
+                self.occurrence_index.save()
+            self.occurrences_changed = False
+        print(f"Export completed to '{storage.location}'")
+
+    def yaml_storage(self, yaml_file: Optional[str] = None) -> YAMLStorage:
+        if not yaml_file or yaml_file == self.yaml_file:
+            if not isinstance(self.storage, YAMLStorage):
+                raise ValueError(
+                    f"'{self.yaml_file}' isn't a YAML file, pass the YAML file to use"
+                )
+            return self.storage
+        return YAMLStorage(yaml_file)
+
+    def from_yaml(self, yaml_file: Optional[str] = None) -> None:
+        self.load(storage=self.yaml_storage(yaml_file))
+
+    def to_dict(self) -> Dict[str, Any]:
+        sorted_keys = sorted(self.messages.keys())
+        return {"messages": [self.messages[k].to_dict() for k in sorted_keys]}
+
+    def to_yaml(self, yaml_file: Optional[str] = None) -> None:
+        self.save(storage=self.yaml_storage(yaml_file))
 
     def randomize_messages(self) -> None:
         keys = list(self.messages.keys())
@@ -99,24 +246,52 @@ class Translator:
         trimmed_msgid = self.trim_message(msgid)
         return self.messages.get(trimmed_msgid)
 
-    def load_po_files(self, po_folder: str) -> None:
-        for filepath in self.get_po_files(po_folder):
-            print(f"Loading file {filepath}")
-            po_file = pofile(filepath)
+    def load_po_files(
+        self,
+        po_folder: str,
+        incremental: bool = False,
+        workers: int = 1,
+        known_only: bool = False,
+    ) -> None:
+        """Load the PO files found in `po_folder` and merge them into the messages.
+
+        With `incremental`, only the files that changed since the last saved merge
+        are loaded. With `workers` above 1, files are parsed in a process pool.
+        With `known_only`, entries are only merged into the messages already loaded.
+        """
+        filepaths = self.get_po_files(po_folder)
+        changed_filepaths = self.po_manifest.record(filepaths)
+        if incremental:
+            print(
+                f"{len(changed_filepaths)} of {len(filepaths)} PO files changed "
+                "since the last pull"
+            )
+            filepaths = changed_filepaths
+        for filepath, po_file in zip(filepaths, self.parse_po_files(filepaths, workers)):
             lang = po_file.metadata["Language"]
             self.po_files_dict[lang] = po_file
-        self.merge_all_po_files()
+        self.merge_all_po_files(known_only)
 
-    def merge_po_file(self, lang: str, po_file: POFile) -> None:
+    def parse_po_files(self, filepaths: List[str], workers: int = 1) -> List[POFile]:
+        for filepath in filepaths:
+            print(f"Loading file {filepath}")
+        with metrics.timer("po_parse"):
+            if workers > 1 and len(filepaths) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    return list(executor.map(pofile, filepaths))
+            return [pofile(filepath) for filepath in filepaths]
+
+    def merge_po_file(self, lang: str, po_file: POFile, known_only: bool = False) -> None:
+        lang = sys.intern(lang)
         for entry in po_file:
             msgid = str(entry.msgid)
             msgstr = str(entry.msgstr)
             trimmed_msgid = self.trim_message(msgid)
             message = self.find_message(trimmed_msgid)
-            occurances: Set[str] = set({o[0] for o in entry.occurrences if o})
-            flags: Set[str] = set(
-                [flag for flag in entry.flags if flag.startswith("ai18n")]
-            )
+            if not message and known_only:
+                continue
+            occurances: Set[str] = {sys.intern(o[0]) for o in entry.occurrences if o}
+            flags = [flag for flag in entry.flags if flag.startswith("ai18n")]
 
             if not message:
                 message = Message(msgid=trimmed_msgid)
@@ -129,16 +304,19 @@ class Translator:
                 # In some cases, there may be multiple translations for the same message
                 # that are trimmed in different ways. We should prefer the longer one.
                 message.po_translations[lang] = msgstr
-            message.occurances |= set(occurances)
-            message.flags[lang] |= flags
+            if not occurances <= message.occurances:
+                message.occurances |= occurances
+                self.occurrences_changed = True
+            message.add_flags(lang, flags)
 
             if lang == conf["main_language"] and not msgstr:
                 # If the message is empty in the main language, use the msgid
                 message.po_translations[lang] = msgid
 
-    def merge_all_po_files(self) -> None:
-        for lang, po_file in self.po_files_dict.items():
-            self.merge_po_file(lang, po_file)
+    def merge_all_po_files(self, known_only: bool = False) -> None:
+        with metrics.timer("merge"):
+            for lang, po_file in self.po_files_dict.items():
+                self.merge_po_file(lang, po_file, known_only)
 
     def get_po_files(self, po_folder: str) -> List[str]:
         po_files = []
@@ -155,9 +333,144 @@ class Translator:
         checkpoint: bool = True,
         message_regex: Optional[str] = None,
         force: bool = False,
+        concurrency: int = 1,
+        compact_every: Optional[int] = None,
+        batch_size: int = 1,
+        use_memory: bool = False,
+        msgids: Optional[Collection[str]] = None,
+        priority: Optional[str] = None,
+        budget: Optional[float] = None,
+    ) -> None:
+        """Translate the messages that require it, among `msgids` if provided.
+
+        With `batch_size` above 1, several messages share a single prompt. With
+        `checkpoint`, each translated message is checkpointed to the catalog
+        storage (appended to a journal for YAML files), and the catalog is saved
+        every `compact_every` messages (if set) and once the run completes.
+
+        With `use_memory`, translations of msgids that only differ in whitespace
+        are reused without calling the API, and similar translated strings are
+        passed to the AI as references.
+
+        With `priority`, the messages scoring highest (see `ai18n.planner`) are
+        translated first, and with a `budget` in USD, only as many messages as
+        its estimated cost covers.
+        """
+        messages_to_translate = self.select_messages(lang, message_regex, force, msgids)
+        filled_from_memory = False
+        if use_memory:
+            memory = self.load_memory()
+            self.openai_translator.memory = memory
+            if not force:
+                remaining = self.fill_from_memory(
+                    memory, messages_to_translate, lang, dry_run, checkpoint
+                )
+                filled_from_memory = len(remaining) < len(messages_to_translate)
+                messages_to_translate = remaining
+        self.openai_translator.scheduler.set_max_concurrency(concurrency)
+        if not dry_run:
+            self.openai_translator.on_translation = self.commit_translation
+        batches = self.plan_batches(
+            messages_to_translate, lang, force, batch_size, priority, budget
+        )
+        messages_to_translate = [msg for batch in batches for msg in batch]
+        # Time to first translation, from the first request
+        metrics.start_clock("first_translation")
+        if concurrency <= 1:
+            processed = 0
+            for batch in batches:
+                print(f"Translating message ({processed}/{len(messages_to_translate)})")
+                results = self.openai_translator.fetch_batch_translations(
+                    batch, force=force, dry_run=dry_run, lang=lang
+                )
+                for msg, translations in results:
+                    processed += 1
+                    self.openai_translator.apply_translations(
+                        msg, translations, dry_run=dry_run
+                    )
+                    if checkpoint:
+                        self.checkpoint_message(msg, processed, compact_every)
+        else:
+            self.translate_concurrently(
+                batches,
+                concurrency,
+                dry_run,
+                checkpoint,
+                force,
+                compact_every,
+                lang,
+            )
+        metrics.increment("messages_translated", len(messages_to_translate))
+        # Memory fills are only journaled, they need a save even when nothing else ran
+        if checkpoint and (messages_to_translate or filled_from_memory):
+            self.save()
+        summary = f"Translation complete, processed {len(messages_to_translate)} messages"
+        if (first_translation := metrics.marks.get("first_translation")) is not None:
+            summary += f", first translation after {first_translation:.2f}s"
+        print(summary)
+
+    def plan_batches(
+        self,
+        messages: List[Message],
+        lang: Optional[str] = None,
+        force: bool = False,
+        batch_size: int = 1,
+        priority: Optional[str] = None,
+        budget: Optional[float] = None,
+    ) -> List[List[Message]]:
+        """Group the messages into the batches to request, in order."""
+        from ai18n.planner import prioritize, prioritize_batches, TranslationPlanner
+
+        if priority:
+            messages = prioritize(messages, priority)
+        batches = self.openai_translator.make_batches(messages, batch_size, lang, force)
+        if batch_size > 1:
+            print(f"Grouped messages into {len(batches)} batches")
+        if priority:
+            batches = prioritize_batches(batches, priority)
+        if budget is not None:
+            planner = TranslationPlanner(self.openai_translator, lang, force)
+            batches = planner.within_budget(batches, budget, self.openai_translator.model)
+            selected = sum(len(batch) for batch in batches)
+            print(
+                f"The budget of ${budget:g} covers {selected} of "
+                f"{len(messages)} messages"
+            )
+        return batches
+
+    def plan(
+        self,
+        lang: Optional[str] = None,
+        message_regex: Optional[str] = None,
+        force: bool = False,
+        msgids: Optional[Collection[str]] = None,
+        batch_size: int = 1,
+        priority: Optional[str] = None,
+        budget: Optional[float] = None,
+        concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
     ) -> None:
+        """Print the tokens, cost and time a translation run would take."""
+        from ai18n.planner import TranslationPlanner
+
+        messages = self.select_messages(lang, message_regex, force, msgids)
+        batches = self.plan_batches(messages, lang, force, batch_size, priority, budget)
+        TranslationPlanner(self.openai_translator, lang, force).print_plan(
+            batches, concurrency, requests_per_minute, tokens_per_minute
+        )
+
+    def select_messages(
+        self,
+        lang: Optional[str] = None,
+        message_regex: Optional[str] = None,
+        force: bool = False,
+        msgids: Optional[Collection[str]] = None,
+    ) -> List[Message]:
         messages_to_translate = []
         for msg in self.messages.values():
+            if msgids is not None and msg.trimmed_msgid not in msgids:
+                continue
             if not message_regex or re.match(message_regex, msg.msgid):
                 if msg.requires_translation(lang) or force:
                     messages_to_translate.append(msg)
@@ -167,12 +480,168 @@ class Translator:
             )
         else:
             print(f"Identified {len(messages_to_translate)} messages to translate")
-        for i, msg in enumerate(messages_to_translate):
-            print(f"Translating message ({i}/{len(messages_to_translate)})")
-            self.openai_translator.translate_message(msg, dry_run=dry_run, force=force)
-            if checkpoint:
-                self.to_yaml()
-        print(f"Translation complete, processed {len(messages_to_translate)} messages")
+        return messages_to_translate
+
+    def export_batch(
+        self,
+        batch_file: str,
+        lang: Optional[str] = None,
+        message_regex: Optional[str] = None,
+        force: bool = False,
+        msgids: Optional[Collection[str]] = None,
+    ) -> None:
+        """Write one chat completion request per message to translate, as JSON
+        lines, to be submitted as an offline batch job."""
+        messages = self.select_messages(lang, message_regex, force, msgids)
+        with open(batch_file, "w", encoding="utf-8") as file:
+            for msg in messages:
+                languages = self.openai_translator.languages_for(msg, lang, force)
+                request = self.openai_translator.build_batch_request(msg, languages)
+                file.write(json.dumps(request, ensure_ascii=False) + "\n")
+        print(f"Exported {len(messages)} requests to '{batch_file}'")
+
+    def import_batch(self, batch_file: str) -> None:
+        """Merge the results of an offline batch job into the messages."""
+        messages = {
+            self.openai_translator.custom_id(msg): msg for msg in self.messages.values()
+        }
+        imported = 0
+        with open(batch_file, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                msg = messages.get(result.get("custom_id"))
+                if not msg:
+                    print(
+                        f"Skipping result for unknown message {result.get('custom_id')}"
+                    )
+                    continue
+                translations = self.openai_translator.parse_batch_result(result)
+                if translations:
+                    msg.merge_ai_output(translations)
+                    body = result["response"].get("body") or {}
+                    model = body.get("model") or self.openai_translator.model
+                    msg.update_metadata(model, datetime.datetime.now())
+                    imported += 1
+        print(f"Imported translations for {imported} messages from '{batch_file}'")
+
+    def load_memory(self) -> TranslationMemory:
+        """Translation memory of the whole catalog, loading the translated messages
+        a partial load left out."""
+        messages = dict(self.messages)
+        msgids = self.storage.select_translated()
+        if msgids is not None:
+            missing = [msgid for msgid in msgids if msgid not in self.messages]
+            if missing:
+                print(f"Loading {len(missing)} translated messages for the memory")
+                with metrics.timer("load"):
+                    messages.update(self.storage.load(missing))
+                # The loaded messages stay the ones being translated
+                messages.update(self.messages)
+        return TranslationMemory(messages.values())
+
+    def fill_from_memory(
+        self,
+        memory: TranslationMemory,
+        messages: List[Message],
+        lang: Optional[str] = None,
+        dry_run: bool = False,
+        checkpoint: bool = True,
+    ) -> List[Message]:
+        """Fill missing translations from the translation memory.
+
+        Returns the messages that still require translation.
+        """
+        filled = 0
+        remaining = []
+        for msg in messages:
+            languages = [lang] if lang else conf["target_languages"]
+            translations = {
+                k: v
+                for k, v in memory.exact_matches(msg).items()
+                if k in languages and msg.requires_translation(k)
+            }
+            if translations and not dry_run:
+                msg.merge_ai_output(translations)
+                msg.update_metadata("translation-memory", datetime.datetime.now())
+                filled += len(translations)
+                if checkpoint:
+                    self.storage.checkpoint([msg])
+            if dry_run or msg.requires_translation(lang):
+                remaining.append(msg)
+        print(
+            f"Filled {filled} translations from the translation memory, "
+            f"saving {len(messages) - len(remaining)} API calls"
+        )
+        return remaining
+
+    def translate_concurrently(
+        self,
+        batches: List[List[Message]],
+        concurrency: int,
+        dry_run: bool = False,
+        checkpoint: bool = True,
+        force: bool = False,
+        compact_every: Optional[int] = None,
+        lang: Optional[str] = None,
+    ) -> None:
+        """Translate batches of messages with at most `concurrency` requests in flight.
+
+        API calls run in worker threads, while merging results and checkpointing
+        happen in the calling thread as each request completes.
+        """
+        print(f"Translating with up to {concurrency} concurrent requests")
+        total = sum(len(batch) for batch in batches)
+        processed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(
+                    self.openai_translator.fetch_batch_translations,
+                    batch,
+                    force=force,
+                    dry_run=dry_run,
+                    lang=lang,
+                )
+                for batch in batches
+            ]
+            for future in as_completed(futures):
+                for msg, translations in future.result():
+                    print(f"Translating message ({processed}/{total})")
+                    processed += 1
+                    with self.lock:
+                        self.openai_translator.apply_translations(
+                            msg, translations, dry_run=dry_run
+                        )
+                        if checkpoint:
+                            self.checkpoint_message(msg, processed, compact_every)
+
+    def commit_translation(self, message: Message, lang: str, translation: str) -> None:
+        """Merge a translation streamed in by a worker as soon as it's complete,
+        it gets checkpointed along with the rest of the response."""
+        with self.lock:
+            message.merge_ai_output({lang: translation})
+        metrics.mark("first_translation")
+
+    def checkpoint_message(
+        self, message: Message, processed: int, compact_every: Optional[int] = None
+    ) -> None:
+        self.storage.checkpoint([message])
+        if compact_every and processed % compact_every == 0:
+            self.save()
+
+    @staticmethod
+    def index_po_file(po_file: POFile) -> Dict[str, POEntry]:
+        """Map each msgid to its entry, matching what `POFile.find` would return:
+        the entry without a msgctxt if any, the first one otherwise."""
+        index: Dict[str, POEntry] = {}
+        for entry in po_file:
+            if entry.obsolete:
+                continue
+            indexed = index.get(entry.msgid)
+            if indexed is None or (indexed.msgctxt and not entry.msgctxt):
+                index[entry.msgid] = entry
+        return index
 
     def push_po_file(
         self,
@@ -180,13 +649,24 @@ class Translator:
         po_file: POFile,
         prefer_ai: bool = False,
         occurrence_regex: Optional[str] = None,
-    ) -> None:
+        msgids: Optional[Collection[str]] = None,
+    ) -> bool:
+        """Push translations into a PO file, returns whether any msgstr changed.
+
+        Only the messages in `msgids` are pushed, if provided. The file is only
+        saved when something changed.
+        """
         msg_count = 0
+        changed = False
+        index = self.index_po_file(po_file)
+        occurrence_pattern = re.compile(occurrence_regex) if occurrence_regex else None
         for message in self.messages.values():
-            entry = po_file.find(message.msgid)
+            if msgids is not None and message.trimmed_msgid not in msgids:
+                continue
+            entry = index.get(message.msgid)
             if entry and message.ai_translations:
-                if occurrence_regex and not any(
-                    re.match(occurrence_regex, o[0]) for o in entry.occurrences
+                if occurrence_pattern and not any(
+                    occurrence_pattern.match(o[0]) for o in entry.occurrences
                 ):
                     continue
                 po_translation = message.po_translations.get(lang, entry.msgstr)
@@ -199,91 +679,208 @@ class Translator:
                         translation = ai_translation or po_translation
                 else:
                     translation = po_translation or ai_translation
-                entry.msgstr = translation
+                if entry.msgstr != translation:
+                    entry.msgstr = translation
+                    changed = True
                 msg_count += 1
+        if not changed:
+            print(f"No translation changed for {lang}.po, skipping save")
+            return False
         print(f"Exporting {msg_count} messages to {lang}.po")
         po_file.save()
+        return True
 
     def push_all_po_files(
-        self, prefer_ai: bool = False, occurrence_regex: Optional[str] = None
+        self,
+        prefer_ai: bool = False,
+        occurrence_regex: Optional[str] = None,
+        msgids: Optional[Collection[str]] = None,
+        compile_mo: bool = False,
+        compile_json: bool = False,
     ) -> None:
-        for lang, po_file in self.po_files_dict.items():
-            self.push_po_file(lang, po_file, prefer_ai, occurrence_regex)
+        """Push translations into every PO file.
+
+        With `compile_mo` / `compile_json`, the `.mo` files and Superset JSON
+        catalogs of the languages that changed are written next to their PO file.
+        """
+        with metrics.timer("po_push"):
+            for lang, po_file in self.po_files_dict.items():
+                changed = self.push_po_file(
+                    lang, po_file, prefer_ai, occurrence_regex, msgids
+                )
+                compile_po_file(po_file, changed, compile_mo, compile_json)
 
     @staticmethod
     def count_words(text: str) -> int:
         """Helper function to count words in a string."""
-        words = re.findall(r"\b\w+\b", text)  # Find word-like sequences
+        words = WORD_REGEX.findall(text)  # Find word-like sequences
         return len(words)
 
-    def compute_translation_statistics(self) -> Dict[str, Dict[str, Any]]:
-        """Compute percentage of strings and words translated for each language."""
-        # Initialize statistics data structure
-        stats = {
-            lang: {
-                "po_translated_strings": 0,
-                "ai_translated_strings": 0,
-                "total_strings": 0,
-                "po_translated_words": 0,
-                "ai_translated_words": 0,
-                "total_words": 0,
-                "orphaned": 0,
-            }
-            for lang in conf["target_languages"]
-        }
+    def load_for_report(self, by_prefix: bool = False) -> None:
+        """Load what `report` needs, only counts if the storage can aggregate them."""
+        if not by_prefix:
+            counts = self.storage.count_translations(conf["target_languages"])
+            if counts is not None:
+                print(f"Counted {counts.total_strings} messages without loading them")
+                self.storage_counts = counts
+                return
+        self.load()
 
-        for msgid, message in self.messages.items():
+    @staticmethod
+    def count_translations(messages: Iterable[Message]) -> TranslationCounts:
+        """Count the strings and words translated for each language.
+
+        Totals are the same for every language so they're counted once, then each
+        message only visits the languages it has translations for.
+        """
+        total_strings = total_words = orphaned = 0
+        counts = {lang: [0, 0, 0, 0] for lang in conf["target_languages"]}
+
+        for message in messages:
             # Assume English text for counting words
-            english_word_count = self.count_words(msgid)
-
-            for lang in conf["target_languages"]:
-                po_translation = message.po_translations.get(lang)
-                ai_translation = message.ai_translations.get(lang) or po_translation
-                stats[lang]["total_strings"] += 1
-                stats[lang]["total_words"] += english_word_count
-
-                # Check if the translation is orphaned (missing occurrences)
-                if len(message.occurances) == 0:
-                    stats[lang]["orphaned"] += 1
-
-                # If the message is translated (non-empty)
-                if po_translation:
-                    stats[lang]["po_translated_strings"] += 1
-                    stats[lang]["po_translated_words"] += english_word_count
-                # If the message is translated (non-empty)
-                if ai_translation:
-                    stats[lang]["ai_translated_strings"] += 1
-                    stats[lang]["ai_translated_words"] += english_word_count
+            word_count = message.word_count
+            total_strings += 1
+            total_words += word_count
+            # Check if the translation is orphaned (missing occurrences)
+            if not message.occurances:
+                orphaned += 1
+
+            po_translations = message.po_translations
+            for lang, translation in po_translations.items():
+                if translation and (count := counts.get(lang)):
+                    count[0] += 1
+                    count[1] += word_count
+                    count[2] += 1
+                    count[3] += word_count
+            # The AI coverage falls back on PO translations, counted above
+            for lang, translation in message.ai_translations.items():
+                if (
+                    translation
+                    and not po_translations.get(lang)
+                    and (count := counts.get(lang))
+                ):
+                    count[2] += 1
+                    count[3] += word_count
+        return TranslationCounts(total_strings, total_words, orphaned, counts)
+
+    def compute_translation_statistics(
+        self, messages: Optional[Iterable[Message]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Compute the number of strings and words translated for each language,
+        from the counts the storage aggregated if the catalog wasn't loaded."""
+        if messages is None and self.storage_counts is not None:
+            counts = self.storage_counts
+        else:
+            counts = self.count_translations(
+                self.messages.values() if messages is None else messages
+            )
 
+        stats: Dict[str, Dict[str, Any]] = {}
+        for lang in conf["target_languages"]:
+            lang_counts = counts.languages[lang]
+            data: Dict[str, Any] = {
+                "po_translated_strings": lang_counts[0],
+                "ai_translated_strings": lang_counts[2],
+                "po_translated_words": lang_counts[1],
+                "ai_translated_words": lang_counts[3],
+                "total_strings": counts.total_strings,
+                "total_words": counts.total_words,
+                "orphaned": counts.orphaned,
+            }
+            for source in ("po", "ai"):
+                for unit in ("strings", "words"):
+                    total = data[f"total_{unit}"]
+                    translated = data[f"{source}_translated_{unit}"]
+                    data[f"{source}_{unit}_percentage"] = (
+                        round(translated / total * 100, 2) if total else 0
+                    )
+            stats[lang] = data
         return stats
 
-    def print_report(self) -> None:
+    def compute_prefix_statistics(
+        self, prefix_depth: int = 1
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Statistics per occurrence prefix, eg `superset-frontend` vs `superset`.
+
+        Messages appearing under several prefixes count for each of them, orphaned
+        ones are grouped under an empty prefix.
+        """
+        groups: Dict[str, List[Message]] = {}
+        for message in self.messages.values():
+            prefixes = {
+                occurrence_prefix(occurrence, prefix_depth)
+                for occurrence in message.occurances
+            } or {""}
+            for prefix in prefixes:
+                groups.setdefault(prefix, []).append(message)
+        return {
+            prefix: self.compute_translation_statistics(groups[prefix])
+            for prefix in sorted(groups)
+        }
+
+    def build_report(
+        self, by_prefix: bool = False, prefix_depth: int = 1
+    ) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"languages": self.compute_translation_statistics()}
+        if by_prefix:
+            report["prefixes"] = self.compute_prefix_statistics(prefix_depth)
+        return report
+
+    def print_report(self, by_prefix: bool = False, prefix_depth: int = 1) -> None:
         """Print a report showing translation statistics for each language."""
-        stats = self.compute_translation_statistics()
+        report = self.build_report(by_prefix, prefix_depth)
 
         print("Translation Statistics Report:")
-        print(f"{'Language':<10} | {'PO %':<20} | {'Orphaned':<10} | {'PO+AI %':<10}")
-        print("=" * 60)
+        self.print_statistics_table(report["languages"])
+        for prefix, stats in report.get("prefixes", {}).items():
+            print()
+            print(f"Strings in {prefix or '(no occurrence)'}:")
+            self.print_statistics_table(stats)
 
+    @staticmethod
+    def print_statistics_table(stats: Dict[str, Dict[str, Any]]) -> None:
+        print(
+            f"{'Language':<10} | {'PO %':<20} | {'Orphaned':<10} | {'PO+AI %':<10} | "
+            f"{'PO words %':<10} | {'PO+AI words %':<10}"
+        )
+        print("=" * 90)
         for lang, data in stats.items():
-            total_strings = data["total_strings"]
-            # total_words = data["total_words"]
-            po_translated_strings = data["po_translated_strings"]
-            # po_translated_words = data["po_translated_words"]
-            ai_translated_strings = data["ai_translated_strings"]
-            # ai_translated_words = data["ai_translated_words"]
-            orphaned = data["orphaned"]
-
-            # Calculate percentage of translated strings and words
-            string_po_translation_percentage = (
-                (po_translated_strings / total_strings) * 100 if total_strings > 0 else 0
-            )
-            # Calculate percentage of translated strings and words
-            string_ai_translation_percentage = (
-                (ai_translated_strings / total_strings) * 100 if total_strings > 0 else 0
-            )
-
-            # Print the report row
             print(
-                f"{lang:<10} | {string_po_translation_percentage:>19.2f}% | {orphaned:<10} | {string_ai_translation_percentage:>8.2f}%"
+                f"{lang:<10} | {data['po_strings_percentage']:>19.2f}% | "
+                f"{data['orphaned']:<10} | {data['ai_strings_percentage']:>8.2f}% | "
+                f"{data['po_words_percentage']:>9.2f}% | "
+                f"{data['ai_words_percentage']:>12.2f}%"
             )
+
+    def write_report(
+        self,
+        stream: TextIO,
+        output_format: str = "json",
+        by_prefix: bool = False,
+        prefix_depth: int = 1,
+    ) -> None:
+        """Write the report as JSON, or CSV with one row per prefix and language."""
+        report = self.build_report(by_prefix, prefix_depth)
+        if output_format == "json":
+            json.dump(report, stream, indent=2, ensure_ascii=False)
+            stream.write("\n")
+            return
+        rows = [("(all)", lang, data) for lang, data in report["languages"].items()]
+        for prefix, stats in report.get("prefixes", {}).items():
+            rows += [(prefix or "(no occurrence)", lang, d) for lang, d in stats.items()]
+        fields = list(next(iter(report["languages"].values()), {}).keys())
+        writer = csv.writer(stream)
+        writer.writerow(["prefix", "language", *fields])
+        for prefix, lang, data in rows:
+            writer.writerow([prefix, lang, *(data[field] for field in fields)])
+
+
+def restrict(
+    msgids: Optional[Collection[str]], only: Optional[Collection[str]]
+) -> Optional[Collection[str]]:
+    """Intersection of two optional msgid selections, None meaning all of them."""
+    if only is None:
+        return msgids
+    if msgids is None:
+        return only
+    return set(msgids) & set(only)
@@ -0,0 +1,39 @@
+from typing import Any, Dict, IO
+
+import yaml
+
+from ai18n.message import Message
+
+try:
+    # The libyaml-backed loader is much faster than the pure-Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+# libyaml's emitter folds long quoted scalars differently from the pure-Python one,
+# so dumping sticks to the latter to keep the output byte-compatible
+SafeDumper = yaml.SafeDumper
+
+
+def load_yaml(stream: IO[str]) -> Any:
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump_yaml(data: Any, stream: IO[str]) -> None:
+    yaml.dump(data, stream, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+
+
+def dump_messages(messages: Dict[str, Message], stream: IO[str]) -> None:
+    """Write messages in sorted order, one at a time.
+
+    The output is the same as dumping `{"messages": [...]}` in one go, without
+    building the dict representation of every message in memory first.
+    """
+    if not messages:
+        dump_yaml({"messages": []}, stream)
+        return
+    stream.write("messages:\n")
+    for key in sorted(messages):
+        # Block sequences aren't indented under a mapping key, so each single-item
+        # list renders exactly like one item of the full list
+        dump_yaml([messages[key].to_dict()], stream)
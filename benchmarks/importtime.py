@@ -0,0 +1,106 @@
+"""Measure the startup cost of each ai18n subcommand with `python -X importtime`.
+
+Each subcommand runs in a fresh interpreter against an empty catalog in a
+temporary folder, so that what gets measured is mostly the imports it triggers.
+
+    python benchmarks/importtime.py [--runs 5] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+# Heavy dependencies that only `translate` should pull in
+HEAVY_MODULES = ["openai", "jinja2", "httpx", "pydantic"]
+
+SUBCOMMANDS: Dict[str, List[str]] = {
+    "report": ["report"],
+    "po-pull": ["po-pull", "--po-files-folder", "{po_folder}"],
+    "po-push": ["po-push", "--po-files-folder", "{po_folder}"],
+    "flush-ai": ["flush-ai"],
+    "translate": ["translate", "--export-batch", "{tmp}/batch.jsonl"],
+}
+
+
+def parse_importtime(stderr: str) -> Tuple[int, List[str]]:
+    """Total import time in microseconds, and the top-level modules imported."""
+    total = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented, top-level ones add up to the total
+        if not name.startswith("  "):
+            total += int(cumulative)
+        modules.append(name.strip())
+    return total, modules
+
+
+def run_subcommand(args: List[str], tmp: str) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env["AI18N_YAML_FILE"] = os.path.join(tmp, "translations.yaml")
+    env.pop("OPENAI_API_KEY", None)
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "ai18n.cli", *args],
+        env=env,
+        cwd=tmp,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_time = time.perf_counter() - start
+    import_time, modules = parse_importtime(result.stderr)
+    return {
+        "wall_time": wall_time,
+        "import_time": import_time / 1e6,
+        "heavy_modules": [m for m in HEAVY_MODULES if m in modules],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per subcommand")
+    parser.add_argument("--json", type=str, help="Write the results to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        po_folder = os.path.join(tmp, "po")
+        os.makedirs(po_folder)
+        # A message to translate, so that `translate` builds a prompt
+        with open(os.path.join(tmp, "translations.yaml"), "w", encoding="utf-8") as f:
+            f.write("messages:\n- msgid: Hello\n  trimmed_msgid: Hello\n")
+        for name, command in SUBCOMMANDS.items():
+            command = [c.format(tmp=tmp, po_folder=po_folder) for c in command]
+            runs = [run_subcommand(command, tmp) for _ in range(args.runs)]
+            results[name] = {
+                "wall_time": statistics.median(r["wall_time"] for r in runs),
+                "import_time": statistics.median(r["import_time"] for r in runs),
+                "heavy_modules": runs[0]["heavy_modules"],
+            }
+
+    print(
+        f"{'Subcommand':<12} | {'Wall (ms)':>10} | {'Imports (ms)':>12} | Heavy modules"
+    )
+    print("=" * 60)
+    for name, result in results.items():
+        print(
+            f"{name:<12} | {result['wall_time'] * 1000:>10.1f} | "
+            f"{result['import_time'] * 1000:>12.1f} | "
+            f"{', '.join(result['heavy_modules']) or '-'}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Measure the memory held by an in-memory catalog with tracemalloc.
+
+Messages are loaded both from PO files (as `po-pull` does) and from the YAML
+catalog it writes (as every other command does).
+
+    python benchmarks/memory.py --messages 10000 --languages 40
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from typing import Callable, Dict
+
+from synthetic import generate_po_files, LANGUAGES
+
+from ai18n.config import conf
+from ai18n.translator import Translator
+
+
+def measure(load: Callable[[], Translator]) -> Dict[str, float]:
+    """Memory held by the messages once loaded, and the peak while loading."""
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator = load()
+    # Only keep the messages alive, as commands do once parsing is done
+    messages = translator.messages
+    del translator
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "messages": len(messages),
+        "current_mb": round(current / 1024 / 1024, 2),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+        "bytes_per_message": round(current / max(len(messages), 1)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--languages", type=int, default=40)
+    parser.add_argument("--json", type=str, help="Write the results to this file")
+    args = parser.parse_args()
+
+    languages = LANGUAGES[: args.languages]
+    conf["target_languages"] = languages
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        po_folder = os.path.join(tmp, "po")
+        yaml_file = os.path.join(tmp, "translations.yaml")
+        generate_po_files(po_folder, args.messages, languages)
+
+        def from_po_files() -> Translator:
+            translator = Translator(yaml_file=yaml_file)
+            translator.load_po_files(po_folder)
+            # The parsed PO files would be dropped by then too
+            translator.po_files_dict = {}
+            with contextlib.redirect_stdout(io.StringIO()):
+                translator.save()
+            return translator
+
+        def from_yaml() -> Translator:
+            return Translator(yaml_file=yaml_file)
+
+        results["po-files"] = measure(from_po_files)
+        results["yaml"] = measure(from_yaml)
+
+    print(f"{args.messages} messages x {args.languages} languages")
+    print(
+        f"{'Loaded from':<12} | {'Held (MB)':>10} | {'Peak (MB)':>10} | "
+        f"{'B/message':>10}"
+    )
+    print("=" * 52)
+    for name, result in results.items():
+        print(
+            f"{name:<12} | {result['current_mb']:>10.2f} | {result['peak_mb']:>10.2f} | "
+            f"{result['bytes_per_message']:>10}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure the prompt rendering throughput of single and batch prompts.
+
+python benchmarks/prompt_render.py [--messages 2000] [--languages 17]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List
+
+from synthetic import LANGUAGES, make_msgid, make_occurrences
+
+from ai18n.backend import EchoBackend
+from ai18n.config import conf
+from ai18n.message import Message
+from ai18n.openai import OpenAIMessageTranslator
+
+
+def make_messages(count: int, languages: List[str], seed: int = 0) -> List[Message]:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        msgid = make_msgid(rng, i)
+        message = Message(
+            msgid=msgid, occurances={path for path, _ in make_occurrences(rng)}
+        )
+        # Half of the languages already translated, passed as references
+        for lang in languages[: len(languages) // 2]:
+            message.po_translations[lang] = f"[{lang}] {msgid}"
+        messages.append(message)
+    return messages
+
+
+def throughput(render: Callable[[], int], repeat: int) -> float:
+    """Best prompts per second over `repeat` runs."""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prompts = render()
+        best = max(best, prompts / (time.perf_counter() - start))
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--languages", type=int, default=17)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", type=str, help="Write the results to this file")
+    args = parser.parse_args()
+
+    languages = LANGUAGES[: args.languages]
+    conf["target_languages"] = languages
+    messages = make_messages(args.messages, languages)
+    missing = languages[len(languages) // 2 :]
+    translator = OpenAIMessageTranslator(model="echo", backend=EchoBackend())
+    batches = [
+        messages[i : i + args.batch_size]
+        for i in range(0, len(messages), args.batch_size)
+    ]
+
+    def single() -> int:
+        for message in messages:
+            translator.build_prompt(message, missing)
+        return len(messages)
+
+    def batch() -> int:
+        for messages_batch in batches:
+            translator.build_batch_prompt(messages_batch, missing)
+        return len(batches)
+
+    results: Dict[str, float] = {
+        "single_prompts_per_second": round(throughput(single, args.repeat)),
+        "batch_prompts_per_second": round(throughput(batch, args.repeat)),
+    }
+    print(f"{args.messages} messages x {args.languages} languages")
+    print(f"Single prompts: {results['single_prompts_per_second']:>8} /s")
+    print(
+        f"Batch prompts:  {results['batch_prompts_per_second']:>8} /s "
+        f"({args.batch_size} messages each)"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""Time every ai18n subcommand against synthetic catalogs.
+
+The API is replaced by the echo backend answering after `--latency` seconds,
+so runs are deterministic and free. Results are appended to a JSON lines file
+and compared with the previous run with the same parameters, to spot
+performance regressions.
+
+    python benchmarks/run.py --messages 1000,10000 --languages 5,40
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from synthetic import generate_po_files, LANGUAGES
+
+from ai18n.backend import EchoBackend
+from ai18n.config import conf
+from ai18n.metrics import metrics
+from ai18n.translator import Translator
+
+CATALOG_FILES = {
+    "yaml": "translations.yaml",
+    "sqlite": "translations.db",
+    "sharded": "translations" + os.sep,
+}
+
+
+def timed(run: Callable[[], None], verbose: bool = False) -> Dict[str, Any]:
+    metrics.reset()
+    output: Any = contextlib.nullcontext()
+    if not verbose:
+        output = contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        run()
+    summary = metrics.summary()
+    return {
+        "wall_time": round(time.perf_counter() - start, 6),
+        "phases": summary["phases"],
+        "api_latency": summary["api_latency"],
+    }
+
+
+def run_scenarios(
+    workdir: str, po_folder: str, args: argparse.Namespace
+) -> Dict[str, Dict[str, Any]]:
+    catalog = os.path.join(workdir, CATALOG_FILES[args.storage])
+    yaml_copy = os.path.join(workdir, "export.yaml")
+
+    def translator(model: Optional[str] = None) -> Translator:
+        return Translator(None, model, catalog, load=False)
+
+    def po_pull(incremental: bool = False) -> None:
+        t = translator()
+        t.load()
+        t.load_po_files(po_folder, incremental=incremental, workers=args.workers)
+        t.save()
+
+    def report() -> None:
+        t = translator()
+        t.load_for_report()
+        t.print_report()
+
+    def translate() -> None:
+        t = translator("echo")
+        t.openai_translator.backend = EchoBackend(latency=args.latency)
+        t.load_for_translation()
+        t.translate(concurrency=args.concurrency, batch_size=args.batch_size)
+
+    def po_push() -> None:
+        t = translator()
+        t.load_for_push()
+        t.load_po_files(po_folder, known_only=True)
+        t.push_all_po_files(prefer_ai=True)
+
+    def po_push_compile() -> None:
+        t = translator()
+        t.load_for_push()
+        t.load_po_files(po_folder, workers=args.workers, known_only=True)
+        t.push_all_po_files(prefer_ai=True, compile_mo=True, compile_json=True)
+
+    def export_yaml() -> None:
+        t = translator()
+        t.load()
+        t.to_yaml(yaml_copy)
+
+    def import_yaml() -> None:
+        t = translator()
+        t.load()
+        t.from_yaml(yaml_copy)
+        t.save()
+
+    def flush_ai() -> None:
+        t = translator()
+        t.load()
+        t.flush_ai()
+        t.save()
+
+    # In workflow order, each scenario starts from the state the previous one left
+    scenarios: Dict[str, Callable[[], None]] = {
+        "po-pull": po_pull,
+        "po-pull (no change)": lambda: po_pull(incremental=True),
+        "report": report,
+        "translate": translate,
+        "po-push": po_push,
+        "po-push (compile)": po_push_compile,
+        "export-yaml": export_yaml,
+        "import-yaml": import_yaml,
+        "flush-ai": flush_ai,
+    }
+    results = {}
+    for name, scenario in scenarios.items():
+        results[name] = timed(scenario, args.verbose)
+        print(f"  {name:<20} {results[name]['wall_time']:>10.3f}s")
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(results_file: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Latest recorded run with the same parameters."""
+    if not os.path.exists(results_file):
+        return None
+    previous = None
+    with open(results_file, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record["params"] == params:
+                    previous = record
+    return previous
+
+
+def compare(
+    current: Dict[str, Any], previous: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Print the change in wall time per scenario, returns the regressed ones."""
+    regressions = []
+    print(f"Compared with {previous['commit']} ({previous['timestamp']}):")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before or not before["wall_time"]:
+            continue
+        ratio = result["wall_time"] / before["wall_time"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- regression"
+            regressions.append(name)
+        print(
+            f"  {name:<20} {before['wall_time']:>10.3f}s -> "
+            f"{result['wall_time']:.3f}s ({ratio:.2f}x){flag}"
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--messages", type=str, default="1000", help="Catalog sizes, comma separated"
+    )
+    parser.add_argument(
+        "--languages",
+        type=str,
+        default="5",
+        help=f"Numbers of languages, comma separated (up to {len(LANGUAGES)})",
+    )
+    parser.add_argument(
+        "--untranslated",
+        type=float,
+        default=0.01,
+        help="Fraction of the msgids left for translate (default: 0.01)",
+    )
+    parser.add_argument(
+        "--storage", choices=list(CATALOG_FILES), default="yaml", help="Catalog storage"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Stub API latency in seconds"
+    )
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="po-pull/push workers")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        help="Keep the generated PO files here and reuse them across runs",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl"),
+        help="JSON lines file the results are appended to",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown over the previous run reported as a regression (default: 0.2)",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with an error when a scenario regressed",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Show ai18n output")
+    args = parser.parse_args()
+
+    regressed = False
+    for messages in [int(n) for n in args.messages.split(",")]:
+        for language_count in [int(n) for n in args.languages.split(",")]:
+            languages = LANGUAGES[:language_count]
+            conf["target_languages"] = languages
+            params = {
+                "messages": messages,
+                "languages": language_count,
+                "untranslated": args.untranslated,
+                "storage": args.storage,
+                "latency": args.latency,
+                "concurrency": args.concurrency,
+                "batch_size": args.batch_size,
+                "workers": args.workers,
+            }
+            print(f"{messages} messages x {language_count} languages")
+            with tempfile.TemporaryDirectory() as workdir:
+                source = os.path.join(
+                    args.data_dir or workdir,
+                    f"po-{messages}-{language_count}-{args.untranslated}",
+                )
+                if not os.path.exists(source):
+                    generate_po_files(source, messages, languages, args.untranslated)
+                # po-push writes to the PO files, work on a copy
+                po_folder = os.path.join(workdir, "po")
+                shutil.copytree(source, po_folder)
+                results = run_scenarios(workdir, po_folder, args)
+
+            record = {
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "params": params,
+                "results": results,
+            }
+            previous = previous_run(args.results, params)
+            if previous and compare(record, previous, args.threshold):
+                regressed = True
+            with open(args.results, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
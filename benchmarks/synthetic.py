@@ -0,0 +1,91 @@
+"""Deterministic synthetic PO catalogs, shaped like the ones of a large web app."""
+
+import os
+import random
+from typing import List, Tuple
+
+from polib import POEntry, POFile
+
+LANGUAGES = [
+    "fr", "es", "de", "it", "ja", "ko", "nl", "pt", "pt_BR", "ru",
+    "sk", "sl", "tr", "uk", "zh", "zh_TW", "ar", "bg", "ca", "cs",
+    "da", "el", "et", "fa", "fi", "he", "hi", "hr", "hu", "id",
+    "lt", "lv", "ms", "nb", "pl", "ro", "sr", "sv", "th", "vi",
+]  # fmt: skip
+
+WORDS = (
+    "chart dashboard dataset column metric filter query database table row value "
+    "time range select add remove edit save cancel apply create delete name type "
+    "error warning the a of to in for with is not be this that please your "
+    "owner permission export import schedule report alert annotation layer"
+).split()
+
+PLACEHOLDERS = ["%(name)s", "%s", "{count}", "%(rows)d"]
+FOLDERS = ["dashboard", "explore", "sqllab", "features/alerts", "views/datasets"]
+
+
+def make_msgid(rng: random.Random, index: int) -> str:
+    words = rng.choices(WORDS, k=rng.randint(1, 14))
+    words[0] = words[0].capitalize()
+    if rng.random() < 0.15:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(PLACEHOLDERS))
+    # The index keeps msgids unique whatever the draw
+    return f"{' '.join(words)} {index}"
+
+
+def make_occurrences(rng: random.Random) -> List[Tuple[str, str]]:
+    occurrences = []
+    for _ in range(rng.randint(0, 3)):
+        if rng.random() < 0.7:
+            folder = rng.choice(FOLDERS)
+            path = f"superset-frontend/src/{folder}/Component{rng.randint(0, 500)}.tsx"
+        else:
+            path = f"superset/views/module{rng.randint(0, 100)}.py"
+        occurrences.append((path, str(rng.randint(1, 2000))))
+    return occurrences
+
+
+def generate_po_files(
+    folder: str,
+    messages: int,
+    languages: List[str],
+    untranslated: float = 0.01,
+    seed: int = 0,
+) -> List[str]:
+    """Write one PO file per language plus the english one to `folder`.
+
+    A fraction `untranslated` of the msgids have no translation in any language,
+    the others are translated everywhere. Returns the paths of the PO files.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for i in range(messages):
+        msgid = make_msgid(rng, i)
+        occurrences = make_occurrences(rng)
+        flags = ["ai18n-force"] if rng.random() < 0.01 else []
+        entries.append((msgid, occurrences, flags, rng.random() < untranslated))
+
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for lang in ["en", *languages]:
+        po_file = POFile()
+        po_file.metadata = {
+            "Language": lang,
+            "Content-Type": "text/plain; charset=UTF-8",
+            "Content-Transfer-Encoding": "8bit",
+        }
+        for msgid, occurrences, flags, is_untranslated in entries:
+            msgstr = "" if lang == "en" or is_untranslated else f"[{lang}] {msgid}"
+            po_file.append(
+                POEntry(
+                    msgid=msgid,
+                    msgstr=msgstr,
+                    occurrences=occurrences,
+                    flags=list(flags) if msgstr else [],
+                )
+            )
+        path = os.path.join(folder, lang, "LC_MESSAGES", "messages.po")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        po_file.save(path)
+        paths.append(path)
+    return paths
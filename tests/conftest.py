@@ -0,0 +1,22 @@
+import os
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from ai18n.message import Message
+from ai18n.translator import Translator
+
+
+@pytest.fixture
+def make_translator(tmp_path: Path) -> Callable[..., Translator]:
+    """Factory of translators holding some messages, with their catalog (a YAML
+    file unless named otherwise) in the test's temp folder."""
+
+    def make(*messages: Message, catalog: str = "test.yml") -> Translator:
+        translator = Translator(yaml_file=os.path.join(tmp_path, catalog))
+        for message in messages:
+            translator.add_message(message)
+        return translator
+
+    return make
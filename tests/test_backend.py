@@ -0,0 +1,97 @@
+import re
+from typing import Callable, Iterator, List
+
+import pytest
+
+from ai18n.backend import Completion, EchoBackend, get_backend
+from ai18n.config import conf
+from ai18n.message import Message
+from ai18n.openai import OpenAIMessageTranslator
+from ai18n.translator import Translator
+
+
+def test_echo_backend_translates(
+    make_translator: Callable[..., Translator], capsys: pytest.CaptureFixture[str]
+) -> None:
+    translator = make_translator(*[Message(msgid=f"message {i}") for i in range(5)])
+    translator.openai_translator = OpenAIMessageTranslator(
+        model="echo", backend=EchoBackend()
+    )
+
+    translator.translate("fr", checkpoint=False, batch_size=3)
+
+    for message in translator.messages.values():
+        assert message.ai_translations == {"fr": f"[fr] {message.msgid}"}
+        assert message.metadata["model_used"] == "echo"
+    assert re.search(
+        r"processed 5 messages, first translation after \d+\.\d\ds",
+        capsys.readouterr().out,
+    )
+
+
+def test_echo_completion() -> None:
+    backend = EchoBackend()
+    prompt = OpenAIMessageTranslator(backend=backend).build_prompt(
+        Message(msgid="Hello"), ["fr", "de"]
+    )
+    completion = backend.complete(prompt, "echo", 100, 0.3)
+    assert completion.text == '{"fr": "[fr] Hello", "de": "[de] Hello"}'
+
+
+def test_get_backend() -> None:
+    assert isinstance(get_backend("echo"), EchoBackend)
+    with pytest.raises(ValueError):
+        get_backend("nope")
+    assert not EchoBackend.supports_batch
+    with pytest.raises(ValueError):
+        OpenAIMessageTranslator(backend=EchoBackend()).build_batch_request(
+            Message(msgid="Hello")
+        )
+
+
+class TruncatingEchoBackend(EchoBackend):
+    """Streams responses cut short after their first translation, as if the
+    completion ran out of tokens."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.prompts: List[str] = []
+
+    def stream(
+        self, prompt: str, model: str, max_tokens: int, temperature: float
+    ) -> Iterator[Completion]:
+        self.prompts.append(prompt)
+        text = self.complete(prompt, model, max_tokens, temperature).text
+        if ", " in text:
+            text = text[: text.index(", ") + 5]
+        for i in range(0, len(text), self.CHUNK_SIZE):
+            yield Completion(text[i : i + self.CHUNK_SIZE])
+
+
+def test_streamed_translations_survive_truncation(
+    make_translator: Callable[..., Translator], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setitem(conf, "target_languages", ["fr", "de", "ja"])
+    translator = make_translator(Message(msgid="Save"))
+    backend = TruncatingEchoBackend()
+    translator.openai_translator = OpenAIMessageTranslator(model="echo", backend=backend)
+    translator.openai_translator.stream = True
+    streamed = []
+    commit_translation = translator.commit_translation
+
+    def record_commit(message: Message, lang: str, translation: str) -> None:
+        streamed.append(lang)
+        commit_translation(message, lang, translation)
+
+    monkeypatch.setattr(translator, "commit_translation", record_commit)
+
+    translator.translate(checkpoint=False)
+
+    assert translator.messages["Save"].ai_translations == {
+        lang: f"[{lang}] Save" for lang in ["fr", "de", "ja"]
+    }
+    # The salvaged language isn't requested again, only the missing ones
+    assert "following locales: fr, de, ja\n" in backend.prompts[0]
+    assert "following locales: de, ja\n" in backend.prompts[1]
+    assert "following locales: ja\n" in backend.prompts[2]
+    assert streamed == ["fr", "de", "ja"]
@@ -0,0 +1,34 @@
+import time
+from pathlib import Path
+
+from ai18n.cache import ResponseCache
+
+
+def test_cache_roundtrip(tmp_path: Path) -> None:
+    cache = ResponseCache(str(tmp_path))
+    key = cache.make_key("gpt-4", 0.3, "system", "prompt")
+    assert key != cache.make_key("gpt-4", 0.5, "system", "prompt")
+    assert cache.get(key) is None
+
+    cache.set(key, "gpt-4", {"fr": "Bonjour"})
+    assert cache.get(key) == {"fr": "Bonjour"}
+    assert ResponseCache(str(tmp_path)).get(key) == {"fr": "Bonjour"}
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["models"] == {"gpt-4": 1}
+
+
+def test_cache_prune(tmp_path: Path) -> None:
+    cache = ResponseCache(str(tmp_path))
+    for i in range(10):
+        cache.set(str(i), "gpt-4", {"fr": "x" * 1000})
+        time.sleep(0.001)
+    cache.get("0")  # Most recently used entry survives size-based eviction
+
+    assert cache.prune(max_size_mb=5000 / 1024 / 1024) == 6
+    assert cache.get("0") is not None
+    assert cache.get("1") is None
+
+    assert cache.prune(max_age_days=0) == 4
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+from ai18n.cli import main
+
+
+def test_cli_import_skips_openai_and_jinja() -> None:
+    # Commands other than translate shouldn't pay for importing the openai SDK
+    code = (
+        "import sys, ai18n.cli; "
+        "print(','.join(m for m in ('openai', 'jinja2') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_cli_rejects_batch_files_without_backend_support(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    argv = ["ai18n", "translate", "--backend", "echo", "--export-batch", "b.jsonl"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as exc_info:
+        main()
+    assert exc_info.value.code == 2
+    assert "the echo backend doesn't support batch jobs" in capsys.readouterr().err
@@ -0,0 +1,77 @@
+import io
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from polib import pofile
+
+from ai18n.daemon import CatalogDaemon, forward, ResidentTranslator
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_daemon_serves_and_watches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    po_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_folder)
+    yaml_file = os.path.join(tmp_path, "translations.yaml")
+
+    # The catalog stays where it was when started, whatever the client's cwd
+    monkeypatch.chdir(tmp_path)
+    translator = ResidentTranslator("translations.yaml", po_folder)
+    assert translator.storage.location == yaml_file
+    # Starting the daemon pulls the PO files into the catalog
+    assert os.path.exists(yaml_file)
+    assert translator.messages["Yes"].po_translations["sp"]
+
+    daemon = CatalogDaemon(translator, poll_interval=0.05)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(daemon.path):
+                break
+            time.sleep(0.01)
+
+        output = io.StringIO()
+        exit_code = forward(
+            ["report", "--format", "csv"], yaml_file, po_folder, output, output
+        )
+        assert exit_code == 0
+        assert "(all),fr," in output.getvalue()
+
+        # Daemons only serve the PO folder they watch
+        other = os.path.join(tmp_path, "other")
+        assert forward(["report"], yaml_file, other, output, output) is None
+
+        # Only the changed PO file gets merged again
+        sp_po_file = pofile(os.path.join(po_folder, "sp.po"))
+        entry = sp_po_file.find("Yes")
+        assert entry is not None
+        entry.msgstr = "Sí, claro"
+        sp_po_file.save()
+        exit_code = forward(["po-push"], yaml_file, po_folder, output, output)
+        assert exit_code == 0
+        assert translator.messages["Yes"].po_translations["sp"] == "Sí, claro"
+        assert "Loading file" in output.getvalue()
+        assert "po/en.po" not in output.getvalue()
+
+        # What commands log goes to the client too
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ["translate", "--backend", "echo", "--message-regex", "^Yes$", "--force"]
+        argv += ["--log-level", "DEBUG"]
+        assert forward(argv, yaml_file, po_folder, stdout, stderr) == 0
+        assert '"""Yes"""' in stderr.getvalue()
+
+        # Clients with other settings don't get served
+        monkeypatch.setenv("AI18N_TARGET_LANGUAGES", "fr")
+        assert forward(["report"], yaml_file, po_folder, output, output) is None
+    finally:
+        daemon.stopped = True
+        thread.join()
+    assert not os.path.exists(daemon.path)
+    assert forward(["report"], yaml_file, po_folder) is None
@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+from typing import Callable
+
+from ai18n.message import Message
+from ai18n.storage import YAMLStorage
+from ai18n.translator import Translator
+
+
+def test_journal_replayed_on_load(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    translator = make_translator(Message(msgid="Hello"), Message(msgid="Goodbye"))
+    translator.to_yaml()
+
+    # Simulate a run that checkpointed one message and crashed before compacting
+    message = translator.messages["Hello"]
+    message.merge_ai_output({"fr": "Bonjour"})
+    message.metadata["model_used"] = "gpt-4"
+    translator.checkpoint_message(message, 1)
+    assert isinstance(translator.storage, YAMLStorage)
+    with open(translator.storage.journal.path, "a", encoding="utf-8") as file:
+        file.write('{"msgid": "Goodb')
+
+    resumed = Translator(yaml_file=yaml_file)
+    assert resumed.messages["Hello"].ai_translations == {"fr": "Bonjour"}
+    assert resumed.messages["Hello"].metadata["model_used"] == "gpt-4"
+    assert resumed.messages["Goodbye"].ai_translations == {}
+
+    resumed.to_yaml()
+    assert isinstance(resumed.storage, YAMLStorage)
+    assert not os.path.exists(resumed.storage.journal.path)
+    assert Translator(yaml_file=yaml_file).messages["Hello"].ai_translations == {
+        "fr": "Bonjour"
+    }
@@ -0,0 +1,35 @@
+from ai18n.json_stream import JSONStreamParser
+from ai18n.openai import OpenAIMessageTranslator
+
+
+def test_values_are_emitted_as_they_complete() -> None:
+    text = (
+        '```json\n{"0": {"fr": "Le \\"tableau\\"", "ids": [1, "a"], "de": "Tafel"}}'
+        "\n```"
+    )
+    parser = JSONStreamParser()
+    values = []
+    for i in range(0, len(text), 5):
+        values += parser.feed(text[i : i + 5])
+    assert values == [(("0", "fr"), 'Le "tableau"'), (("0", "de"), "Tafel")]
+    assert parser.complete
+    assert parser.result == {"0": {"fr": 'Le "tableau"', "de": "Tafel"}}
+
+
+def test_truncated_responses_are_salvaged() -> None:
+    parser = JSONStreamParser().parse('{"fr": "Bonjour", "de": "Hallo", "ja": "こん')
+    assert not parser.complete
+    assert parser.result == {"fr": "Bonjour", "de": "Hallo"}
+
+
+def test_fenced_complete_responses_are_complete() -> None:
+    translator = OpenAIMessageTranslator(api_key="test", model="stub")
+    response = '```json\n{"fr": "Bonjour", "de": "Hallo"}\n```'
+    assert translator.decode_response(response) == (
+        {"fr": "Bonjour", "de": "Hallo"},
+        True,
+    )
+    assert translator.decode_response('```json\n{"fr": "Bonjour", "de": "Ha') == (
+        {"fr": "Bonjour"},
+        False,
+    )
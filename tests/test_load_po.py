@@ -1,5 +1,9 @@
 import os
+import shutil
+from pathlib import Path
+from typing import Callable
 
+from ai18n.storage import YAMLStorage
 from ai18n.translator import Translator
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,3 +28,55 @@ def test_load_po_file() -> None:
     assert translator.messages["Goodbye"].po_translations["sp"] == "Adiós"
     assert translator.messages["Goodbye"].po_translations["en"] == "BeBye"
     assert translator.messages["Hello"].po_translations["en"] == "Hi"
+
+
+def test_incremental_parallel_load_po_files(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_files_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_files_folder)
+    yaml_file = os.path.join(tmp_path, "test.yml")
+
+    full = make_translator(catalog="full.yml")
+    full.load_po_files(po_files_folder)
+
+    translator = make_translator()
+    translator.load_po_files(po_files_folder, incremental=True, workers=2)
+    assert translator.to_dict() == full.to_dict()
+    translator.to_yaml()
+
+    with open(os.path.join(po_files_folder, "sp.po"), "a", encoding="utf-8") as file:
+        file.write('\nmsgid "Maybe"\nmsgstr "Quizás"\n')
+    full.load_po_files(po_files_folder)
+
+    translator = Translator(yaml_file=yaml_file)
+    translator.load_po_files(po_files_folder, incremental=True)
+    assert list(translator.po_files_dict) == ["sp"]
+    assert translator.to_dict() == full.to_dict()
+
+
+def test_incremental_load_after_outside_catalog_changes(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_files_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_files_folder)
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    translator = make_translator()
+    translator.load_po_files(po_files_folder, incremental=True)
+    translator.save()
+    languages = sorted(translator.po_files_dict)
+
+    # Saving the catalog again keeps the PO files it merged up to date
+    translator = Translator(yaml_file=yaml_file)
+    translator.messages["Hello"].merge_ai_output({"fr": "Salut"})
+    translator.save()
+    translator = Translator(yaml_file=yaml_file)
+    translator.load_po_files(po_files_folder, incremental=True)
+    assert translator.po_files_dict == {}
+
+    # The catalog gets replaced without the manifest, eg by a git checkout
+    YAMLStorage(yaml_file).save({})
+    translator = Translator(yaml_file=yaml_file)
+    translator.load_po_files(po_files_folder, incremental=True)
+    assert sorted(translator.po_files_dict) == languages
+    assert translator.messages["Goodbye"].po_translations["sp"] == "Adiós"
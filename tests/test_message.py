@@ -0,0 +1,25 @@
+from ai18n.message import Message
+
+
+def test_message_dict_roundtrip() -> None:
+    data = {
+        "trimmed_msgid": "Hello",
+        "msgid": "Hello",
+        "occurances": ["src/a.tsx", "src/b.tsx"],
+        "po_translations": {"fr": "Bonjour"},
+        "metadata": {"model_used": "gpt-4"},
+        "ai_translations": {"de": "Hallo"},
+        "flags": {"fr": ["ai18n-force"]},
+    }
+    message = Message.from_dict(data)
+    assert message.to_dict() == data
+    assert not hasattr(message, "__dict__")
+
+
+def test_flags_only_allocated_when_present() -> None:
+    message = Message(msgid="Hello")
+    message.add_flags("fr", [])
+    assert message.flags == {}
+    assert message.flags.get("fr") is None
+    message.add_flags("fr", ["ai18n-force"])
+    assert message.flags == {"fr": {"ai18n-force"}}
@@ -0,0 +1,69 @@
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from ai18n.metrics import Metrics, percentile
+from ai18n.openai import OpenAIMessageTranslator
+
+
+def test_percentile() -> None:
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile([], 0.5) is None
+
+
+def test_metrics_summary(tmp_path: Path) -> None:
+    metrics = Metrics()
+    with metrics.timer("load"):
+        pass
+    with metrics.timer("load"):
+        pass
+    metrics.record_latency(0.2)
+    metrics.record_latency(0.4)
+    metrics.record_usage(SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+    metrics.increment("json_parse_failures")
+    metrics.mark("first_translation")
+    first_translation = metrics.marks["first_translation"]
+    metrics.mark("first_translation")
+
+    path = os.path.join(tmp_path, "metrics.json")
+    metrics.write_json(path)
+    with open(path, encoding="utf-8") as file:
+        summary = json.load(file)
+    assert set(summary["phases"]) == {"load"}
+    # Only the first occurrence of an event is marked
+    assert summary["marks"] == {"first_translation": round(first_translation, 6)}
+    assert summary["api_latency"]["count"] == 2
+    assert summary["api_latency"]["p50"] == pytest.approx(0.2)
+    assert summary["api_latency"]["p95"] == pytest.approx(0.4)
+    assert summary["counters"] == {
+        "prompt_tokens": 100,
+        "completion_tokens": 20,
+        "json_parse_failures": 1,
+    }
+
+
+def test_json_parse_failures_are_counted(monkeypatch: pytest.MonkeyPatch) -> None:
+    metrics = Metrics()
+    monkeypatch.setattr("ai18n.openai.metrics", metrics)
+    translator = OpenAIMessageTranslator()
+    assert translator.parse_response("not json") == {}
+    assert translator.parse_response('["not", "an", "object"]') == {}
+    assert metrics.counters["json_parse_failures"] == 2
+
+
+def test_marks_measured_from_their_clock() -> None:
+    metrics = Metrics()
+    metrics.started -= 60
+    metrics.mark("first_translation")
+    assert metrics.marks["first_translation"] >= 60
+
+    # Starting the clock again forgets the previous mark
+    metrics.start_clock("first_translation")
+    assert "first_translation" not in metrics.marks
+    metrics.mark("first_translation")
+    assert metrics.marks["first_translation"] < 60
@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from polib import POEntry, POFile
+
+from ai18n.backend import EchoBackend
+from ai18n.message import Message
+from ai18n.occurrences import changed_files_from_diff
+from ai18n.openai import OpenAIMessageTranslator
+from ai18n.storage import YAMLStorage
+from ai18n.translator import Translator
+
+
+def write_po_file(folder: Path) -> None:
+    po_file = POFile()
+    po_file.metadata = {"Language": "fr"}
+    po_file.append(POEntry(msgid="Chart", occurrences=[("src/explore/Chart.tsx", "3")]))
+    po_file.append(POEntry(msgid="Save", occurrences=[("src/explore/Save.tsx", "12")]))
+    po_file.append(
+        POEntry(msgid="Table", occurrences=[("superset/views/table.py", "40")])
+    )
+    po_file.save(os.path.join(folder, "fr.po"))
+
+
+def test_translate_changed_files(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    write_po_file(tmp_path)
+    translator = make_translator()
+    translator.load_po_files(str(tmp_path))
+    translator.save()
+    assert os.path.exists(translator.occurrence_index.path)
+
+    translator = Translator(yaml_file=yaml_file, load=False)
+    # Changed files are relative to the repository root, occurrences aren't
+    msgids = translator.select_by_changed_files(
+        ["superset-frontend/src/explore/Chart.tsx", "superset/views/table.py"]
+    )
+    assert msgids == {"Chart", "Table"}
+    translator.load_for_translation("fr", only=msgids)
+    translator.openai_translator = OpenAIMessageTranslator(
+        model="echo", backend=EchoBackend()
+    )
+    translator.translate("fr", msgids=msgids)
+
+    translator = Translator(yaml_file=yaml_file)
+    assert translator.messages["Chart"].ai_translations == {"fr": "[fr] Chart"}
+    assert translator.messages["Table"].ai_translations == {"fr": "[fr] Table"}
+    assert translator.messages["Save"].ai_translations == {}
+
+
+def test_index_built_from_a_single_load(
+    tmp_path: Path,
+    make_translator: Callable[..., Translator],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    write_po_file(tmp_path)
+    translator = make_translator()
+    translator.load_po_files(str(tmp_path))
+    translator.save()
+    os.remove(translator.occurrence_index.path)
+    capsys.readouterr()
+
+    # The catalog loaded to build the index serves the translation too
+    translator = Translator(yaml_file=yaml_file, load=False)
+    msgids = translator.select_by_changed_files(["src/explore/Chart.tsx"])
+    translator.load_for_translation("fr", only=msgids)
+    assert msgids == {"Chart"}
+    assert capsys.readouterr().out.count("Loading translations") == 1
+
+
+def test_index_rebuilt_after_outside_catalog_changes(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    write_po_file(tmp_path)
+    translator = make_translator()
+    translator.load_po_files(str(tmp_path))
+    translator.save()
+
+    # Saves that don't merge occurrences keep the index current
+    translator = Translator(yaml_file=yaml_file)
+    translator.messages["Chart"].merge_ai_output({"fr": "Graphique"})
+    translator.save()
+    assert translator.occurrence_index.is_current()
+
+    # The catalog gets changed without the index, eg by a git checkout
+    storage = YAMLStorage(yaml_file)
+    messages = storage.load()
+    delete = Message(msgid="Delete", occurances={"src/explore/Delete.tsx"})
+    messages[delete.trimmed_msgid] = delete
+    storage.save(messages)
+
+    translator = Translator(yaml_file=yaml_file, load=False)
+    assert translator.select_by_changed_files(["src/explore/Delete.tsx"]) == {"Delete"}
+
+
+def test_changed_files_from_diff() -> None:
+    diff = (
+        "diff --git a/src/Chart.tsx b/src/Chart.tsx\n"
+        "--- a/src/Chart.tsx\n"
+        "+++ b/src/Chart.tsx\n"
+        "@@ -1 +1 @@\n"
+        "--- removed SQL comment\n"
+    )
+    assert changed_files_from_diff(diff) == ["src/Chart.tsx"]
+    assert changed_files_from_diff("a.py\nsrc/b.tsx\n") == ["a.py", "src/b.tsx"]
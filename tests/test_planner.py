@@ -0,0 +1,54 @@
+from typing import Callable
+
+import pytest
+
+from ai18n.backend import EchoBackend
+from ai18n.message import Message
+from ai18n.openai import OpenAIMessageTranslator
+from ai18n.planner import prioritize, TranslationPlanner
+from ai18n.translator import Translator
+
+
+@pytest.fixture
+def translator(make_translator: Callable[..., Translator]) -> Translator:
+    translator = make_translator(
+        Message(msgid="Save", occurances={"superset/views.py"}),
+        Message(
+            msgid="Save the dashboard",
+            occurances={"superset-frontend/src/Dashboard.tsx", "superset/a.py"},
+        ),
+        Message(msgid="A much longer string to translate", occurances={"superset/b.py"}),
+    )
+    translator.openai_translator = OpenAIMessageTranslator(
+        model="gpt-4o", backend=EchoBackend()
+    )
+    return translator
+
+
+def test_prioritize(translator: Translator) -> None:
+    messages = list(translator.messages.values())
+    assert prioritize(messages, "occurrences")[0].msgid == "Save the dashboard"
+    assert prioritize(messages, "words")[0].msgid.startswith("A much longer")
+    assert prioritize(messages, "frontend")[0].msgid == "Save the dashboard"
+
+
+def test_budget_caps_the_run(translator: Translator) -> None:
+    planner = TranslationPlanner(translator.openai_translator, "fr")
+    messages = prioritize(list(translator.messages.values()), "frontend")
+    costs = [planner.cost([planner.estimate([msg])], "gpt-4o") or 0 for msg in messages]
+
+    # Enough budget for the two highest priority messages only
+    budget = sum(costs[:2])
+    translator.translate("fr", checkpoint=False, priority="frontend", budget=budget)
+    translated = {m.msgid for m in translator.messages.values() if m.ai_translations}
+    assert translated == {messages[0].msgid, messages[1].msgid}
+
+
+def test_plan(translator: Translator, capsys: pytest.CaptureFixture[str]) -> None:
+    translator.plan("fr", concurrency=2, requests_per_minute=1)
+    output = capsys.readouterr().out
+    assert "Plan: 3 messages in 3 requests" in output
+    assert "gpt-4o*" in output
+    # Rate limited to a request per minute
+    assert "2 concurrent requests: 3m 00s" in output
+    assert not any(m.ai_translations for m in translator.messages.values())
@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Callable
+
+from polib import mofile, POEntry, POFile, pofile
+
+from ai18n.translator import Translator
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_push_po_files(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_files_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_files_folder)
+    sp_po_file = os.path.join(po_files_folder, "sp.po")
+
+    translator = make_translator()
+    translator.load_po_files(po_files_folder)
+    translator.messages["Yes"].ai_translations["sp"] = "Sí, claro"
+    translator.messages["No"].ai_translations["sp"] = "No"
+
+    translator.push_all_po_files(prefer_ai=True)
+    yes, no = pofile(sp_po_file).find("Yes"), pofile(sp_po_file).find("No")
+    assert yes is not None and yes.msgstr == "Sí, claro"
+    assert no is not None and no.msgstr == "No"
+
+    # Nothing changed since the last push, the file is left untouched
+    os.utime(sp_po_file, (0, 0))
+    assert not translator.push_po_file("sp", translator.po_files_dict["sp"], True)
+    assert os.path.getmtime(sp_po_file) == 0
+
+
+def test_push_compiles_changed_languages(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_files_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_files_folder)
+
+    translator = make_translator()
+    translator.load_po_files(po_files_folder)
+    translator.messages["Yes"].ai_translations["sp"] = "Sí, claro"
+    translator.push_all_po_files(prefer_ai=True, compile_mo=True, compile_json=True)
+
+    mo_entry = mofile(os.path.join(po_files_folder, "sp.mo")).find("Yes")
+    assert mo_entry is not None and mo_entry.msgstr == "Sí, claro"
+    with open(os.path.join(po_files_folder, "sp.json"), encoding="utf-8") as file:
+        catalog = json.load(file)
+    messages = catalog["locale_data"]["superset"]
+    assert messages[""]["lang"] == "sp"
+    assert messages["Yes"] == ["Sí, claro"]
+
+    # Compiled files of languages that didn't change are only written when missing
+    os.utime(os.path.join(po_files_folder, "sp.mo"), (0, 0))
+    translator.push_all_po_files(prefer_ai=True, compile_mo=True)
+    assert os.path.getmtime(os.path.join(po_files_folder, "sp.mo")) == 0
+
+
+def test_push_only_merges_loaded_messages(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_files_folder = os.path.join(tmp_path, "po")
+    shutil.copytree(os.path.join(current_dir, "fixtures", "po"), po_files_folder)
+    db_file = os.path.join(tmp_path, "test.db")
+    translator = make_translator(catalog="test.db")
+    translator.load_po_files(po_files_folder)
+    translator.messages["Yes"].ai_translations["sp"] = "Sí, claro"
+    translator.save()
+
+    # Only the messages with AI translations get loaded, and merged into
+    translator = Translator(yaml_file=db_file, load=False)
+    translator.load_for_push()
+    translator.load_po_files(po_files_folder, known_only=True)
+    assert list(translator.messages) == ["Yes"]
+    translator.push_all_po_files(prefer_ai=True)
+    entry = pofile(os.path.join(po_files_folder, "sp.po")).find("Yes")
+    assert entry is not None and entry.msgstr == "Sí, claro"
+
+
+def test_push_skips_entries_with_a_context(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    po_file = POFile()
+    po_file.metadata = {"Language": "fr"}
+    po_file.append(POEntry(msgid="Save", msgctxt="verb", msgstr="Sauvegarder"))
+    po_file.append(POEntry(msgid="Save", msgstr=""))
+    po_file.save(os.path.join(tmp_path, "fr.po"))
+    translator = make_translator()
+    translator.load_po_files(str(tmp_path))
+    translator.messages["Save"].ai_translations["fr"] = "Enregistrer"
+
+    translator.push_all_po_files(prefer_ai=True)
+
+    # The entry without a context gets the translation, as POFile.find has it
+    saved = pofile(os.path.join(tmp_path, "fr.po"))
+    entry = saved.find("Save")
+    assert entry is not None and entry.msgstr == "Enregistrer"
+    context_entry = saved.find("Save", msgctxt="verb")
+    assert context_entry is not None and context_entry.msgstr == "Sauvegarder"
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+import os
+from pathlib import Path
+from typing import Callable, List
+
+from ai18n.config import conf
+from ai18n.message import Message
+from ai18n.storage import SQLiteStorage
+from ai18n.translator import Translator
+
+
+def report_messages() -> List[Message]:
+    return [
+        Message(
+            msgid="Save the chart",
+            po_translations={"fr": "Enregistrer le graphique", "es": ""},
+            occurances={"superset-frontend/src/Chart.tsx"},
+        ),
+        Message(
+            msgid="Table",
+            ai_translations={"es": "Tabla", "ja": "テーブル"},
+            occurances={"superset/views/table.py", "superset-frontend/src/Table.tsx"},
+        ),
+        Message(msgid="Orphaned string"),
+    ]
+
+
+def test_translation_statistics(make_translator: Callable[..., Translator]) -> None:
+    translator = make_translator(*report_messages())
+
+    stats = translator.compute_translation_statistics()
+
+    assert set(stats) == set(conf["target_languages"])
+    assert stats["fr"]["total_strings"] == 3
+    assert stats["fr"]["total_words"] == 6
+    assert stats["fr"]["orphaned"] == 1
+    assert stats["fr"]["po_translated_strings"] == 1
+    assert stats["fr"]["po_translated_words"] == 3
+    assert stats["fr"]["ai_strings_percentage"] == 33.33
+    assert stats["fr"]["ai_words_percentage"] == 50
+    assert stats["es"]["po_translated_strings"] == 0
+    assert stats["es"]["ai_translated_strings"] == 1
+    assert stats["es"]["ai_words_percentage"] == 16.67
+
+
+def test_report_formats(make_translator: Callable[..., Translator]) -> None:
+    translator = make_translator(*report_messages())
+
+    stream = io.StringIO()
+    translator.write_report(stream, "json", by_prefix=True)
+    report = json.loads(stream.getvalue())
+    assert set(report["prefixes"]) == {"", "superset", "superset-frontend"}
+    frontend = report["prefixes"]["superset-frontend"]
+    assert frontend["fr"]["total_strings"] == 2
+    assert frontend["fr"]["po_strings_percentage"] == 50
+
+    stream = io.StringIO()
+    translator.write_report(stream, "csv", by_prefix=True)
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert len(rows) == 4 * len(conf["target_languages"])
+    assert rows[0]["prefix"] == "(all)"
+
+
+def test_report_counts_from_sqlite(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    translator = make_translator(*report_messages())
+    expected = translator.compute_translation_statistics()
+    db_file = os.path.join(tmp_path, "test.db")
+    translator.save(SQLiteStorage(db_file))
+
+    # The counts are aggregated in SQL, without loading the messages
+    translator = Translator(yaml_file=db_file, load=False)
+    translator.load_for_report()
+    assert translator.messages == {}
+    assert translator.compute_translation_statistics() == expected
@@ -0,0 +1,117 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from openai import RateLimitError
+
+from ai18n.backend import OpenAICompatibleBackend
+from ai18n.message import Message
+from ai18n.openai import OpenAIMessageTranslator, parse_duration, RequestScheduler
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """OpenAI-compatible chat completion endpoint answering 429s to the first
+    `rate_limited` requests."""
+
+    def __init__(self, rate_limited: int) -> None:
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.rate_limited = rate_limited
+        self.statuses: List[int] = []
+        self.lock = threading.Lock()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            status = 429 if len(self.server.statuses) < self.server.rate_limited else 200
+            self.server.statuses.append(status)
+        body: Dict[str, Any]
+        if status == 429:
+            body = {"error": {"message": "Rate limit reached", "type": "requests"}}
+        else:
+            content = json.dumps({"fr": "Bonjour"})
+            body = {
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "fake",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 429:
+            self.send_header("retry-after-ms", "10")
+            self.send_header("x-ratelimit-remaining-requests", "0")
+            self.send_header("x-ratelimit-reset-requests", "20ms")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server() -> Iterator[FakeOpenAIServer]:
+    server = FakeOpenAIServer(rate_limited=3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_message_translator(
+    server: FakeOpenAIServer, max_retries: int
+) -> OpenAIMessageTranslator:
+    scheduler = RequestScheduler(max_concurrency=4, max_retries=max_retries)
+    backend = OpenAICompatibleBackend(
+        base_url=f"http://127.0.0.1:{server.server_port}/v1"
+    )
+    return OpenAIMessageTranslator(scheduler=scheduler, backend=backend)
+
+
+def test_retries_rate_limited_requests(server: FakeOpenAIServer) -> None:
+    translator = make_message_translator(server, max_retries=5)
+    message = Message(msgid="Hello")
+
+    translator.translate_message(message, lang="fr")
+
+    assert server.statuses == [429, 429, 429, 200]
+    assert message.ai_translations == {"fr": "Bonjour"}
+    # Rate limited responses halved the requests allowed in flight down to 1,
+    # then the successful one increased it additively
+    assert translator.scheduler.concurrency_limit == 2
+
+
+def test_gives_up_after_max_retries(server: FakeOpenAIServer) -> None:
+    translator = make_message_translator(server, max_retries=1)
+    with pytest.raises(RateLimitError):
+        translator.translate_message(Message(msgid="Hello"), lang="fr")
+    assert server.statuses == [429, 429]
+
+
+def test_requests_per_minute_budget() -> None:
+    scheduler = RequestScheduler(requests_per_minute=2)
+    for _ in range(2):
+        scheduler.acquire(10)
+        scheduler.release()
+    assert scheduler.wait_time(10, scheduler.requests[0]) == pytest.approx(60)
+
+
+def test_parse_duration() -> None:
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1.5") == 1.5
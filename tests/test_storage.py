@@ -0,0 +1,107 @@
+import os
+from pathlib import Path
+from typing import Callable, List
+
+from ai18n.message import Message
+from ai18n.storage import ShardedYAMLStorage, SQLiteStorage, YAMLStorage
+from ai18n.translator import Translator
+
+
+def storage_messages() -> List[Message]:
+    return [
+        Message(
+            msgid="Hello",
+            po_translations={"fr": "Bonjour", "de": "", "es": "Hola"},
+            ai_translations={"fr": "Salut"},
+            metadata={"model_used": "gpt-4"},
+            occurances={"superset/views/core.py"},
+            flags={"fr": {"ai18n-force"}},
+        ),
+        Message(msgid="Goodbye", po_translations={"fr": "Au revoir", "de": "Tschüss"}),
+    ]
+
+
+def test_sqlite_roundtrip(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    yaml_file = os.path.join(tmp_path, "test.yml")
+    db_file = os.path.join(tmp_path, "test.db")
+    make_translator(*storage_messages()).to_yaml()
+
+    translator = Translator(yaml_file=db_file)
+    assert isinstance(translator.storage, SQLiteStorage)
+    translator.from_yaml(yaml_file)
+    translator.save()
+
+    exported = os.path.join(tmp_path, "exported.yml")
+    Translator(yaml_file=db_file).to_yaml(exported)
+    with open(yaml_file, encoding="utf-8") as a, open(exported, encoding="utf-8") as b:
+        assert a.read() == b.read()
+
+
+def test_sqlite_partial_load(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    db_file = os.path.join(tmp_path, "test.db")
+    storage = SQLiteStorage(db_file)
+    storage.save(make_translator(*storage_messages()).messages)
+
+    assert storage.select_requiring_translation(["fr"]) == []
+    assert storage.select_requiring_translation(["fr", "de"]) == ["Hello"]
+    assert storage.select_with_ai_translations() == ["Hello"]
+
+    translator = Translator(yaml_file=db_file, load=False)
+    translator.load_for_translation("de")
+    assert list(translator.messages) == ["Hello"]
+    translator.messages["Hello"].merge_ai_output({"de": "Hallo"})
+    translator.save()
+
+    # Saving a partially loaded catalog leaves the other messages alone
+    messages = SQLiteStorage(db_file).load()
+    assert messages["Hello"].ai_translations == {"fr": "Salut", "de": "Hallo"}
+    assert messages["Goodbye"].po_translations == {"fr": "Au revoir", "de": "Tschüss"}
+    assert isinstance(Translator(yaml_file="x.yml", load=False).storage, YAMLStorage)
+
+
+def test_sharded_storage(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    shards_folder = os.path.join(tmp_path, "translations") + os.sep
+    translator = make_translator(*storage_messages(), catalog="translations" + os.sep)
+    assert isinstance(translator.storage, ShardedYAMLStorage)
+    translator.save()
+    assert sorted(os.listdir(shards_folder)) == [
+        "core.yaml",
+        "de.yaml",
+        "es.yaml",
+        "fr.yaml",
+    ]
+    expected = translator.to_dict()
+
+    # Only dirty shards are rewritten
+    translator = Translator(yaml_file=shards_folder)
+    for shard in os.listdir(shards_folder):
+        os.utime(os.path.join(shards_folder, shard), (0, 0))
+    translator.messages["Goodbye"].merge_ai_output({"fr": "Salut", "de": "Ciao"})
+    translator.save()
+    modified = [
+        shard
+        for shard in sorted(os.listdir(shards_folder))
+        if os.path.getmtime(os.path.join(shards_folder, shard)) != 0
+    ]
+    assert modified == ["de.yaml", "fr.yaml"]
+
+    messages = Translator(yaml_file=shards_folder).messages
+    assert messages["Goodbye"].ai_translations == {"de": "Ciao", "fr": "Salut"}
+    assert messages["Goodbye"].po_translations == {"de": "Tschüss", "fr": "Au revoir"}
+    assert messages["Hello"].to_dict()["flags"] == expected["messages"][1]["flags"]
+    assert messages["Hello"].po_translations["es"] == "Hola"
+
+    # Translating loads every shard, the other languages are prompt references
+    translator = Translator(yaml_file=shards_folder, load=False)
+    translator.load_for_translation("de")
+    assert translator.messages["Hello"].po_translations == {
+        "fr": "Bonjour",
+        "de": "",
+        "es": "Hola",
+    }
@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pytest
+
+from ai18n.config import conf
+from ai18n.message import Message
+from ai18n.openai import MAX_TOKEN, OpenAIMessageTranslator, RequestScheduler
+from ai18n.translator import Translator
+from ai18n.yaml_io import load_yaml
+
+
+class StubMessageTranslator(OpenAIMessageTranslator):
+    def __init__(self) -> None:
+        self.model = "stub"
+        self.scheduler = RequestScheduler()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def execute_prompt(
+        self,
+        message: Message,
+        dry_run: bool = False,
+        languages: Optional[List[str]] = None,
+    ) -> Dict[str, str]:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        return {"fr": f"fr:{message.msgid}"}
+
+
+def test_translate_concurrently(make_translator: Callable[..., Translator]) -> None:
+    translator = make_translator(*[Message(msgid=f"message {i}") for i in range(20)])
+    stub = StubMessageTranslator()
+    translator.openai_translator = stub
+
+    translator.translate("fr", checkpoint=False, concurrency=4)
+
+    assert 1 < stub.max_in_flight <= 4
+    for message in translator.messages.values():
+        assert message.ai_translations["fr"] == f"fr:{message.msgid}"
+        assert message.metadata["model_used"] == "stub"
+
+
+class BatchStubMessageTranslator(OpenAIMessageTranslator):
+    def __init__(self) -> None:
+        super().__init__(api_key="test", model="stub")
+        self.prompts: List[str] = []
+
+    def complete(self, prompt: str, max_tokens: int = MAX_TOKEN) -> str:
+        self.prompts.append(prompt)
+        msgids = re.findall(r'to translate: """(.*)"""', prompt)
+        if len(msgids) == 1:
+            return json.dumps({"fr": f"fr:{msgids[0]}"})
+        # Drop the last message from batch responses to exercise the retry path
+        return json.dumps(
+            {str(i): {"fr": f"fr:{msgid}"} for i, msgid in enumerate(msgids[:-1])}
+        )
+
+
+def test_translate_batches(make_translator: Callable[..., Translator]) -> None:
+    translator = make_translator(*[Message(msgid=f"message {i}") for i in range(10)])
+    stub = BatchStubMessageTranslator()
+    translator.openai_translator = stub
+
+    translator.translate("fr", checkpoint=False, batch_size=4)
+
+    # 3 batches of 4, 4 and 2 messages, plus one retry per batch
+    assert len(stub.prompts) == 6
+    for message in translator.messages.values():
+        assert message.ai_translations["fr"] == f"fr:{message.msgid}"
+
+
+@pytest.mark.parametrize("catalog", ["test.yml", "test.db"])
+def test_translate_with_memory(
+    tmp_path: Path, make_translator: Callable[..., Translator], catalog: str
+) -> None:
+    make_translator(
+        Message(msgid="Delete dashboard", po_translations={"fr": "Supprimer"}),
+        Message(msgid="Delete  dashboard"),
+        Message(msgid="Delete dashboard?"),
+        catalog=catalog,
+    ).save()
+
+    # SQLite only loads the messages to translate, the memory loads the others
+    translator = Translator(yaml_file=os.path.join(tmp_path, catalog), load=False)
+    translator.load_for_translation("fr")
+    stub = BatchStubMessageTranslator()
+    translator.openai_translator = stub
+
+    translator.translate("fr", checkpoint=False, use_memory=True)
+
+    assert translator.messages["Delete  dashboard"].ai_translations == {"fr": "Supprimer"}
+    assert len(stub.prompts) == 1
+    assert '- """Delete dashboard""": fr: \'Supprimer\'' in stub.prompts[0]
+    assert translator.messages["Delete dashboard?"].ai_translations == {
+        "fr": "fr:Delete dashboard?"
+    }
+
+
+def test_translate_saves_messages_filled_from_memory(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    translator = make_translator(
+        Message(msgid="Delete dashboard", po_translations={"fr": "Supprimer"}),
+        Message(msgid="Delete  dashboard"),
+    )
+    translator.save()
+    stub = BatchStubMessageTranslator()
+    translator.openai_translator = stub
+
+    translator.translate("fr", use_memory=True)
+
+    # Nothing went to the API, yet the fill is in the YAML file, not only the journal
+    assert stub.prompts == []
+    assert not os.path.exists(os.path.join(tmp_path, "test.yml.journal"))
+    with open(os.path.join(tmp_path, "test.yml")) as f:
+        saved = {message["msgid"]: message for message in load_yaml(f)["messages"]}
+    assert saved["Delete  dashboard"]["ai_translations"] == {"fr": "Supprimer"}
+
+
+def test_translate_requests_missing_languages_only(
+    make_translator: Callable[..., Translator],
+) -> None:
+    complete = {lang: lang for lang in conf["target_languages"]}
+    translator = make_translator(
+        Message(msgid="One", po_translations=dict(complete)),
+        Message(msgid="Two", po_translations=dict(complete)),
+        Message(msgid="Three"),
+    )
+    del translator.messages["One"].po_translations["fr"]
+    del translator.messages["Two"].po_translations["fr"]
+    stub = BatchStubMessageTranslator()
+    translator.openai_translator = stub
+
+    translator.translate(checkpoint=False, batch_size=10)
+
+    # One batch for the messages only missing French (plus the stub's retry),
+    # then a prompt for the message missing every language
+    assert len(stub.prompts) == 3
+    assert "following locales: fr\n" in stub.prompts[0]
+    assert "following locales: fr\n" in stub.prompts[1]
+    all_languages = ", ".join(conf["target_languages"])
+    assert f"following locales: {all_languages}\n" in stub.prompts[2]
+
+
+def test_export_and_import_batch_files(
+    tmp_path: Path, make_translator: Callable[..., Translator]
+) -> None:
+    translator = make_translator(Message(msgid="Hello"), Message(msgid="Goodbye"))
+    requests_file = os.path.join(tmp_path, "requests.jsonl")
+    results_file = os.path.join(tmp_path, "results.jsonl")
+
+    translator.export_batch(requests_file, lang="fr")
+
+    with open(requests_file, encoding="utf-8") as file:
+        requests = [json.loads(line) for line in file]
+    assert len(requests) == 2
+    with open(results_file, "w", encoding="utf-8") as file:
+        for request in requests:
+            prompt = request["body"]["messages"][1]["content"]
+            msgid = re.findall(r'to translate: """(.*)"""', prompt)[0]
+            content = json.dumps({"fr": f"fr:{msgid}"})
+            result = {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {
+                        "model": "gpt-4o-batch",
+                        "choices": [{"message": {"content": content}}],
+                    },
+                },
+                "error": None,
+            }
+            file.write(json.dumps(result) + "\n")
+
+    translator.import_batch(results_file)
+
+    for message in translator.messages.values():
+        assert message.ai_translations == {"fr": f"fr:{message.msgid}"}
+        assert message.metadata["model_used"] == "gpt-4o-batch"
+
+
+def test_prompts_share_a_static_prefix() -> None:
+    translator = OpenAIMessageTranslator(api_key="test", model="stub")
+    first = translator.build_prompt(Message(msgid="Save"), ["fr"])
+    second = translator.build_prompt(
+        Message(msgid="Delete", occurances={"superset/views.py"}), ["de", "ja"]
+    )
+    prefix = first[: first.index("- Provide translations")]
+    assert second.startswith(prefix)
+    assert "Instructions:" in prefix
+    # Templates are compiled once per run
+    assert list(translator.templates) == ["prompt.jinja"]
@@ -0,0 +1,33 @@
+import io
+
+import yaml
+
+from ai18n.message import Message
+from ai18n.yaml_io import dump_messages, load_yaml
+
+
+def test_dump_messages_matches_yaml_dump() -> None:
+    messages = {}
+    for msgid in ["Hello", "Goodbye", "  Padded  ", "Nom de l’ensemble", "x" * 200]:
+        message = Message(
+            msgid=msgid,
+            po_translations={"fr": f"'{msgid}' \"quoted\": #", "ja": "日付として解析"},
+            ai_translations={"de": msgid * 3},
+            metadata={"model_used": "gpt-4"},
+            occurances={"superset/views/core.py", "superset-frontend/src/a.tsx"},
+            flags={"fr": {"ai18n-force"}},
+        )
+        messages[message.trimmed_msgid] = message
+    data = {"messages": [messages[k].to_dict() for k in sorted(messages)]}
+
+    stream = io.StringIO()
+    dump_messages(messages, stream)
+
+    assert stream.getvalue() == yaml.dump(data, allow_unicode=True, sort_keys=False)
+    assert load_yaml(io.StringIO(stream.getvalue())) == data
+
+
+def test_dump_no_messages() -> None:
+    stream = io.StringIO()
+    dump_messages({}, stream)
+    assert stream.getvalue() == yaml.dump({"messages": []})